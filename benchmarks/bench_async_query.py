@@ -0,0 +1,136 @@
+# benchmarks/bench_async_query.py
+# ----------------------------------------------------
+# Load test: sync `def` query handler (threadpool) vs async handler
+#
+# Fires N concurrent document questions at a FastAPI app in-process, with
+# embeddings and chat completions served by the fake OpenAI server and
+# vectors in local Qdrant. Reports how many upstream requests were in
+# flight at once and the resulting throughput.
+#
+#   python -m benchmarks.bench_async_query --concurrency 200 --chat-latency 1.0
+# ----------------------------------------------------
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+from benchmarks.fakes import EMBEDDING_DIM, FakeOpenAIServer, fake_embedding
+
+WORDS = "delivery refund warranty invoice store parking booking payment account size colour gift".split()
+
+
+def _setup_service(server: FakeOpenAIServer, business_id: str, chunks: int):
+    # Point the service's clients at the stand-ins before it is imported
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["OPENAI_API_BASE"] = server.url
+    os.environ["OPENAI_BASE_URL"] = server.url
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    os.environ["EMBED_CACHE_ENABLED"] = "false"
+    os.environ["ANSWER_CACHE_ENABLED"] = "false"
+    os.environ["QA_SEMANTIC_ENABLED"] = "false"
+
+    from langchain_openai import OpenAIEmbeddings
+    from qdrant_client import AsyncQdrantClient, QdrantClient
+    from qdrant_client.http import models as qmodels
+
+    from knowledge import service, versions
+    from knowledge.pipeline import COLLECTION_NAME
+    from knowledge.qa_index import qa_indexes
+
+    points = [
+        qmodels.PointStruct(
+            id=i,
+            vector=fake_embedding(text),
+            payload={"business_id": business_id, "page_content": text, "chunk_index": i},
+        )
+        for i, text in enumerate(" ".join(WORDS[(i + j) % len(WORDS)] for j in range(30)) for i in range(chunks))
+    ]
+    vectors = qmodels.VectorParams(size=EMBEDDING_DIM, distance=qmodels.Distance.COSINE)
+
+    # Local mode: the sync and async clients each hold their own copy
+    qdrant = QdrantClient(location=":memory:")
+    qdrant.create_collection(COLLECTION_NAME, vectors_config=vectors)
+    qdrant.upsert(COLLECTION_NAME, points=points)
+    aqdrant = AsyncQdrantClient(location=":memory:")
+
+    async def load_async():
+        await aqdrant.create_collection(COLLECTION_NAME, vectors_config=vectors)
+        await aqdrant.upsert(COLLECTION_NAME, points=points)
+
+    asyncio.run(load_async())
+    service.qdrant = service.pipelines.client = qdrant
+    service.embeddings = OpenAIEmbeddings(
+        openai_api_key="bench",
+        openai_api_base=server.url,
+        check_embedding_ctx_length=False,
+    )
+    service.aqdrant = service.pipelines.aclient = aqdrant
+
+    # No manual Q/As and no knowledge changes: keep the benchmark off the database.
+    # The stamps would otherwise be read from the knowledge_versions table.
+    async def aget_stamp(business_id):
+        return (0, 0)
+
+    versions.get_stamp = lambda business_id: (0, 0)
+    versions.aget_stamp = aget_stamp
+    qa_indexes.put(business_id, [], versions.get_version(business_id, versions.QA))
+    return service
+
+
+def _app(service):
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.post("/sync")
+    def sync_query(payload: dict):
+        return service.answer_query(payload["business_id"], payload["query"])
+
+    @app.post("/async")
+    async def async_query(payload: dict):
+        return await service.aanswer_query(payload["business_id"], payload["query"])
+
+    return app
+
+
+async def _fire(app, path: str, business_id: str, n: int):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i):
+            r = await client.post(path, json={"business_id": business_id, "query": f"question {i} about {WORDS[i % len(WORDS)]}"})
+            return r.json()["result"]["response"]["source"]
+
+        start = time.perf_counter()
+        sources = await asyncio.gather(*(one(i) for i in range(n)))
+        return time.perf_counter() - start, sources
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=200, help="simultaneous widget queries")
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05, help="embedding request latency (s)")
+    parser.add_argument("--chat-latency", type=float, default=1.0, help="chat completion latency (s)")
+    args = parser.parse_args()
+
+    business_id = str(uuid.uuid4())
+    with FakeOpenAIServer(latency=args.latency, chat_latency=args.chat_latency, token_latency=0) as server:
+        service = _setup_service(server, business_id, args.chunks)
+        app = _app(service)
+        for label, path in (("sync def (threadpool)", "/sync"), ("async def", "/async")):
+            server.max_in_flight = 0
+            elapsed, sources = asyncio.run(_fire(app, path, business_id, args.concurrency))
+            errors = sum(1 for s in sources if s != "documents")
+            print(
+                f"{label:<22} {args.concurrency} queries in {elapsed:6.2f}s  "
+                f"{args.concurrency / elapsed:6.1f} q/s  max upstream in flight={server.max_in_flight}"
+                + (f"  errors={errors}" if errors else "")
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_context.py
+# ----------------------------------------------------
+# Context packing: retrieved chunks -> token-budgeted prompt context
+#
+# Packs the shape that used to lose a whole document: one short, highly
+# scored manual Q/A hit plus a run of neighbouring document chunks that
+# merge into a passage larger than the budget left after the Q/A. The
+# document must still reach the prompt, cut to fit.
+#
+#   python -m benchmarks.bench_context --chunks 7 --budget 1500
+# ----------------------------------------------------
+
+import argparse
+import random
+import sys
+
+from langchain_core.documents import Document
+
+from knowledge.chunking import CHUNK_OVERLAP
+from knowledge.context import pack_context
+
+WORDS = "delivery refund warranty invoice store parking booking payment account size colour gift".split()
+
+
+def synthetic_chunks(n: int, chunk_chars: int, rnd: random.Random):
+    """Consecutive splitter chunks of one document, each repeating the previous one's overlap."""
+    text = " ".join(f"{rnd.choice(WORDS)}{rnd.randrange(1000)}" for _ in range(n * chunk_chars // 8))
+    step = chunk_chars - CHUNK_OVERLAP
+    return [
+        Document(
+            page_content=text[i * step:i * step + chunk_chars],
+            metadata={"source": "knowledge:doc", "knowledge_id": "doc", "chunk_index": i, "score": 0.8 - i * 0.01},
+        )
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=7, help="neighbouring document chunks retrieved")
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    parser.add_argument("--budget", type=int, default=1500, help="context token budget")
+    args = parser.parse_args()
+
+    qa = Document(
+        page_content="Q: Do you deliver?\nA: Yes.",
+        metadata={"source": "qa:1", "qa_id": "1", "chunk_index": 0, "score": 0.95},
+    )
+    docs = [qa] + synthetic_chunks(args.chunks, args.chunk_chars, random.Random(7))
+    packed, stats = pack_context(docs, token_budget=args.budget)
+
+    kept = [p.metadata.get("source") for p in packed]
+    print(
+        f"{stats['chunks']} chunks -> {stats['passages']} passages ({stats['duplicates']} duplicates), "
+        f"{stats['tokens_in']} -> {stats['tokens_out']} tokens (budget {args.budget})"
+    )
+    print(f"passages: {kept}")
+
+    problems = []
+    if "knowledge:doc" not in kept:
+        problems.append("document passage dropped")
+    if stats["tokens_out"] > args.budget:
+        problems.append(f"budget exceeded by {stats['tokens_out'] - args.budget} tokens")
+    if stats["tokens_in"] > args.budget and stats["tokens_out"] < args.budget // 2:
+        problems.append("less than half the budget used")
+    if problems:
+        print(f"FAILED: {'; '.join(problems)}")
+        sys.exit(1)
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
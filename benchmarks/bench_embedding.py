@@ -0,0 +1,55 @@
+# benchmarks/bench_embedding.py
+# ----------------------------------------------------
+# Per-chunk vs batched embedding against a local stand-in server
+#
+#   python -m benchmarks.bench_embedding --chunks 600 --latency 0.05
+# ----------------------------------------------------
+
+import argparse
+import time
+
+from langchain_openai import OpenAIEmbeddings
+
+from benchmarks.fakes import FakeOpenAIServer
+from knowledge.embedding import embed_chunks
+
+
+def _synthetic_chunks(n: int, size: int = 1000):
+    words = "shipping refund policy warranty order delivery invoice support hours store".split()
+    return [" ".join(words[(i + j) % len(words)] for j in range(size // 8))[:size] + f" #{i}" for i in range(n)]
+
+
+def _rate(label: str, n: int, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {n:>6} chunks  {elapsed:8.2f}s  {n / elapsed:10.1f} chunks/sec")
+    return n / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=600)
+    parser.add_argument("--latency", type=float, default=0.05, help="per-request latency of the stand-in (s)")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=None)
+    args = parser.parse_args()
+
+    chunks = _synthetic_chunks(args.chunks)
+    with FakeOpenAIServer(latency=args.latency) as server:
+        embedder = OpenAIEmbeddings(
+            openai_api_key="bench",
+            openai_api_base=server.url,
+            check_embedding_ctx_length=False,
+        )
+        serial = _rate("serial embed_query", len(chunks), lambda: [embedder.embed_query(c) for c in chunks])
+        batched = _rate(
+            "batched embed_chunks",
+            len(chunks),
+            lambda: embed_chunks(embedder, chunks, batch_size=args.batch_size, concurrency=args.concurrency),
+        )
+        print(f"speedup: {batched / serial:.1f}x  (server saw {server.requests} requests)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# benchmarks/bench_hybrid.py
+# ----------------------------------------------------
+# Offline retrieval eval + latency: dense vs BM25 vs hybrid (RRF)
+#
+#   python -m benchmarks.bench_hybrid --products 2000 --queries 500 --k 4
+#
+# Synthetic catalogue: one chunk per product with a SKU, a price and a
+# brand name. Queries ask for one product by SKU, by price or by name in
+# natural phrasing. The dense stand-in is the fake hashed bag-of-words
+# embedding with code- and number-like tokens removed, which is roughly how
+# a general embedding model treats "SKU-48213" vs "SKU-48231".
+# ----------------------------------------------------
+
+import argparse
+import random
+import re
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+from benchmarks.fakes import fake_embedding
+from knowledge.lexical import BM25Builder, LexicalIndexStore, reciprocal_rank_fusion
+
+ADJECTIVES = "classic slim rugged compact deluxe wireless organic waterproof vintage modern".split()
+ITEMS = "jacket backpack kettle headphones lamp sneakers blender tent watch umbrella".split()
+BRANDS = "Altura Brevik Corvane Dunmore Elstree Fenwick Galloway Harrow Ivesta Jorvik".split()
+FILLER = (
+    "Ships within two business days. Free returns for thirty days. "
+    "Covered by our standard warranty. Ask in store about gift wrapping."
+)
+_DIGITS = re.compile(r"\S*\d\S*")
+
+
+def _corpus(n: int, rnd: random.Random):
+    products = []
+    for i in range(n):
+        products.append({
+            "id": str(uuid.uuid4()),
+            "sku": f"SKU-{rnd.randrange(10000, 99999)}",
+            "price": f"{rnd.randrange(5, 500)}.{rnd.choice(['00', '49', '95', '99'])}",
+            "brand": f"{rnd.choice(BRANDS)}{rnd.choice(['', 'a', 'o', 'ex'])}",
+            "name": f"{rnd.choice(ADJECTIVES)} {rnd.choice(ITEMS)}",
+        })
+    for p in products:
+        p["text"] = f"{p['brand']} {p['name']} ({p['sku']}), priced at ${p['price']}. {FILLER}"
+    return products
+
+
+def _queries(products, n: int, rnd: random.Random):
+    templates = (
+        lambda p: f"is {p['sku']} in stock?",
+        lambda p: f"which {p['name']} costs ${p['price']}?",
+        lambda p: f"tell me about the {p['brand']} {p['name']}",
+    )
+    return [(t(p), p["id"]) for p, t in ((rnd.choice(products), rnd.choice(templates)) for _ in range(n))]
+
+
+def _dense_vector(text: str):
+    return np.asarray(fake_embedding(_DIGITS.sub(" ", text)), dtype=np.float32)
+
+
+def _metrics(rankings, k: int):
+    recall = sum(target in ranking[:k] for ranking, target in rankings) / len(rankings)
+    mrr = sum(1.0 / (ranking.index(target) + 1) for ranking, target in rankings if target in ranking[:k]) / len(rankings)
+    return f"recall@{k}={recall:.3f}  MRR@{k}={mrr:.3f}"
+
+
+def _percentiles(samples):
+    arr = np.asarray(samples) * 1e6
+    return f"p50={np.percentile(arr, 50):8.1f}us  p99={np.percentile(arr, 99):8.1f}us"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=4, help="chunks handed to the LLM")
+    parser.add_argument("--candidates", type=int, default=20, help="per-retriever depth before fusion")
+    parser.add_argument("--rrf-k", type=int, default=60)
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    products = _corpus(args.products, rnd)
+    queries = _queries(products, args.queries, rnd)
+    ids = [p["id"] for p in products]
+    matrix = np.stack([_dense_vector(p["text"]) for p in products])
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    with tempfile.TemporaryDirectory() as root:
+        store = LexicalIndexStore(root, max_open=10)
+        business_id = str(uuid.uuid4())
+
+        start = time.perf_counter()
+        builder = BM25Builder()
+        for p in products:
+            builder.add(p["id"], p["text"])
+        store.write(business_id, builder)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = store.get(business_id)
+        load = time.perf_counter() - start
+
+        dense, lexical, hybrid, bm25_t, fuse_t = [], [], [], [], []
+        for query, target in queries:
+            q = _dense_vector(query)
+            scores = matrix @ (q / (np.linalg.norm(q) or 1.0))
+            top = np.argsort(-scores)[:args.candidates]
+            dense_ids = [ids[i] for i in top]
+
+            t = time.perf_counter()
+            lexical_ids = [pid for pid, _ in index.search(query, args.candidates)]
+            bm25_t.append(time.perf_counter() - t)
+
+            t = time.perf_counter()
+            fused = [pid for pid, _ in reciprocal_rank_fusion([dense_ids, lexical_ids], k=args.rrf_k)]
+            fuse_t.append(time.perf_counter() - t)
+
+            dense.append((dense_ids, target))
+            lexical.append((lexical_ids, target))
+            hybrid.append((fused, target))
+
+    print(f"{args.products} chunks, {args.queries} queries (SKU / price / name)")
+    print(f"  dense only   {_metrics(dense, args.k)}")
+    print(f"  BM25 only    {_metrics(lexical, args.k)}")
+    print(f"  hybrid RRF   {_metrics(hybrid, args.k)}")
+    print(f"  BM25 build+write {build * 1000:.1f} ms, cold load {load * 1000:.1f} ms")
+    print(f"  BM25 search  {_percentiles(bm25_t)}")
+    print(f"  RRF fuse     {_percentiles(fuse_t)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# benchmarks/bench_ingestion.py
+# ----------------------------------------------------
+# Upload + extraction + chunking: in-memory vs streaming path
+#
+#   python -m benchmarks.bench_ingestion --pages 500 2000 5000
+#
+# Each measurement runs in a fresh subprocess so peak RSS is not shared.
+# ----------------------------------------------------
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import fitz
+
+LINE = "Item {n}: stainless steel widget, 40 mm, ships in 2 days, warranty 12 months. "
+
+
+def make_pdf(path: str, pages: int):
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page()
+        text = "\n".join(LINE.format(n=p * 40 + i) for i in range(40))
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def _old_path(pdf_path: str) -> int:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    with open(pdf_path, "rb") as upload:
+        data = upload.read()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        tmp.write(data)
+    try:
+        text = ""
+        with fitz.open(tmp.name) as pdf:
+            for page in pdf:
+                text += page.get_text()
+        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
+        return len(splitter.split_text(text))
+    finally:
+        os.remove(tmp.name)
+
+
+def _new_path(pdf_path: str) -> int:
+    from knowledge.chunking import iter_chunks
+    from knowledge.extraction import iter_pages, spool_to_disk
+
+    with open(pdf_path, "rb") as upload, tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        spool_to_disk(upload, tmp)
+    try:
+        return sum(1 for _ in iter_chunks(iter_pages(tmp.name)))
+    finally:
+        os.remove(tmp.name)
+
+
+def _worker(mode: str, pdf_path: str):
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    chunks = (_old_path if mode == "old" else _new_path)(pdf_path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux
+    print(f"{chunks} {elapsed:.3f} {(peak - base) / 1024:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--worker", nargs=2, metavar=("MODE", "PDF"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(*args.worker)
+        return
+
+    print(f"{'pages':>6} {'file MB':>8} {'path':>5} {'chunks':>7} {'time s':>8} {'+RSS MB':>8}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for pages in args.pages:
+            pdf_path = os.path.join(tmpdir, f"synthetic_{pages}.pdf")
+            make_pdf(pdf_path, pages)
+            size_mb = os.path.getsize(pdf_path) / 1e6
+            for mode in ("old", "new"):
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_ingestion", "--worker", mode, pdf_path],
+                    capture_output=True, text=True, check=True,
+                ).stdout.split()
+                chunks, elapsed, rss = out[-3:]
+                print(f"{pages:>6} {size_mb:>8.1f} {mode:>5} {chunks:>7} {float(elapsed):>8.2f} {float(rss):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_local_index.py
+# ----------------------------------------------------
+# Small-tenant search: local mmap snapshot vs Qdrant
+#
+#   python -m benchmarks.bench_local_index --points 300 1000 2000 --queries 500
+#   python -m benchmarks.bench_local_index --qdrant-url http://localhost:6333
+#
+# Without --qdrant-url the comparison runs against Qdrant's local mode,
+# which has no network round-trip; a remote cluster adds its RTT on top.
+# ----------------------------------------------------
+
+import argparse
+import random
+import tempfile
+import time
+import uuid
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from knowledge.local_index import LocalIndexStore
+
+DIM = 1536
+
+
+def _percentiles(samples):
+    arr = np.asarray(samples) * 1e6
+    return f"p50={np.percentile(arr, 50):8.1f}us  p99={np.percentile(arr, 99):8.1f}us"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, nargs="+", default=[300, 1000, 2000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--qdrant-url", default=None)
+    args = parser.parse_args()
+
+    rnd = np.random.default_rng(7)
+    client = QdrantClient(url=args.qdrant_url) if args.qdrant_url else QdrantClient(location=":memory:")
+    collection = f"bench_local_{uuid.uuid4().hex[:8]}"
+    client.create_collection(collection, vectors_config=qmodels.VectorParams(size=DIM, distance=qmodels.Distance.COSINE))
+
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalIndexStore(root, max_points=max(args.points), max_open=100)
+        for n in args.points:
+            business_id = str(uuid.uuid4())
+            vectors = rnd.standard_normal((n, DIM), dtype=np.float32)
+            ids = [str(uuid.uuid4()) for _ in range(n)]
+            payloads = [{"business_id": business_id, "page_content": f"chunk {i}", "chunk_index": i} for i in range(n)]
+            client.upsert(
+                collection,
+                points=[qmodels.PointStruct(id=i, vector=v.tolist(), payload=p) for i, v, p in zip(ids, vectors, payloads)],
+            )
+            start = time.perf_counter()
+            store.write(business_id, ids, vectors, payloads)
+            write = time.perf_counter() - start
+
+            queries = [vectors[random.randrange(n)] + 0.1 * rnd.standard_normal(DIM, dtype=np.float32) for _ in range(args.queries)]
+            flt = qmodels.Filter(must=[qmodels.FieldCondition(key="business_id", match=qmodels.MatchValue(value=business_id))])
+
+            local, remote, agree = [], [], 0
+            for q in queries:
+                t = time.perf_counter()
+                hits = store.get(business_id).search(q, args.k)
+                local.append(time.perf_counter() - t)
+
+                t = time.perf_counter()
+                points = client.query_points(collection, query=q.tolist(), query_filter=flt, limit=args.k).points
+                remote.append(time.perf_counter() - t)
+                agree += hits[0].id == str(points[0].id)
+
+            print(f"{n:>6} points  snapshot write {write * 1000:6.1f} ms")
+            print(f"        local index  {_percentiles(local)}")
+            print(f"        qdrant       {_percentiles(remote)}  (top-1 agreement {agree}/{len(queries)})")
+
+    client.delete_collection(collection)
+
+
+if __name__ == "__main__":
+    main()
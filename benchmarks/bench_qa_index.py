@@ -0,0 +1,91 @@
+# benchmarks/bench_qa_index.py
+# ----------------------------------------------------
+# Manual Q/A matching: linear scan vs ManualQAIndex
+#
+#   python -m benchmarks.bench_qa_index --qas 10000 --queries 2000
+# ----------------------------------------------------
+
+import argparse
+import random
+import time
+
+from knowledge.qa_index import ManualQAIndex
+
+TOPICS = "delivery refund warranty invoice store parking booking payment account size colour gift".split()
+FORMS = [
+    "what are your {t} options for {n}",
+    "do you offer {t} on item {n}",
+    "how long does {t} take for order {n}",
+    "can i change my {t} for {n}",
+    "is {t} available in region {n}",
+]
+
+
+def synthetic_qas(n: int, rnd: random.Random):
+    return [
+        (str(i), rnd.choice(FORMS).format(t=rnd.choice(TOPICS), n=i), f"Answer {i}")
+        for i in range(n)
+    ]
+
+
+def linear_match(rows, query):
+    """The original answer_query scan."""
+    qnorm = (query or "").strip().lower()
+    for qa_id, question, answer in rows:
+        qqa = (question or "").lower()
+        if not qqa:
+            continue
+        if qnorm in qqa or qqa in qnorm:
+            return qa_id
+    return None
+
+
+def synthetic_queries(rows, n: int, rnd: random.Random):
+    queries = []
+    for _ in range(n):
+        kind = rnd.random()
+        question = rnd.choice(rows)[1]
+        if kind < 0.3:    # visitor types a fragment of a stored question
+            words = question.split()
+            start = rnd.randrange(len(words) - 2)
+            queries.append(" ".join(words[start:start + 3]).upper())
+        elif kind < 0.6:  # visitor message wraps a stored question
+            queries.append(f"hi there, {question}? thanks")
+        else:             # no manual answer
+            queries.append(f"tell me about {rnd.choice(TOPICS)} policy {rnd.randrange(10**6, 10**7)} please")
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--qas", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    rows = synthetic_qas(args.qas, rnd)
+    queries = synthetic_queries(rows, args.queries, rnd)
+
+    start = time.perf_counter()
+    index = ManualQAIndex(rows)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = [linear_match(rows, q) for q in queries]
+    linear = time.perf_counter() - start
+
+    start = time.perf_counter()
+    got = [(m[0] if m else None) for m in (index.match(q) for q in queries)]
+    indexed = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(expected, got) if a != b)
+    hits = sum(1 for a in expected if a is not None)
+    print(f"{args.qas} Q/As, {len(queries)} queries ({hits} with a manual answer)")
+    print(f"index build:   {build * 1000:8.1f} ms (once per Q/A change)")
+    print(f"linear scan:   {linear / len(queries) * 1e6:8.1f} us/query")
+    print(f"index match:   {indexed / len(queries) * 1e6:8.1f} us/query  ({linear / indexed:.0f}x)")
+    print(f"mismatches vs linear scan: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# benchmarks/bench_quantization.py
+# ----------------------------------------------------
+# chatflow_vectors storage settings: RAM, recall@8 and latency
+#
+#   python -m benchmarks.bench_quantization --points 20000
+#   python -m benchmarks.bench_quantization --points 100000 --qdrant-url http://localhost:6333
+#
+# With --qdrant-url every setting gets its own collection on that server,
+# created by knowledge.collection, and recall@8 is measured against an exact
+# (brute-force) search of the same collection.
+#
+# Without it the quantized scoring is simulated in numpy (Qdrant's local mode
+# ignores quantization): int8 with a 0.99 quantile clip, binary as the sign of
+# each dimension, then the top limit * oversampling candidates rescored by the
+# original vectors. Latencies in that mode are brute-force numpy, only useful
+# to compare settings with each other.
+#
+# RAM is estimated as Qdrant lays it out: originals (unless on disk), the
+# quantized copy (always in RAM) and the HNSW links (~2 * m * 4 bytes/point).
+# ----------------------------------------------------
+
+import argparse
+import time
+import uuid
+
+import numpy as np
+
+from knowledge.collection import VECTOR_SIZE
+
+LIMIT = 8
+# (label, quantization, on_disk, oversampling, rescore)
+SETTINGS = (
+    ("float32 in RAM", "none", False, 1.0, False),
+    ("float32 on disk", "none", True, 1.0, False),
+    ("int8, no rescore", "int8", True, 1.0, False),
+    ("int8, x2 + rescore", "int8", True, 2.0, True),
+    ("binary, no rescore", "binary", True, 1.0, False),
+    ("binary, x2 + rescore", "binary", True, 2.0, True),
+    ("binary, x4 + rescore", "binary", True, 4.0, True),
+)
+
+
+def _dataset(n: int, queries: int, seed: int = 7):
+    """Clustered unit vectors (topics of a knowledge base) and queries near existing points."""
+    rnd = np.random.default_rng(seed)
+    centers = rnd.standard_normal((max(n // 200, 8), VECTOR_SIZE), dtype=np.float32)
+    docs = centers[rnd.integers(len(centers), size=n)] + 0.8 * rnd.standard_normal((n, VECTOR_SIZE), dtype=np.float32)
+    docs /= np.linalg.norm(docs, axis=1, keepdims=True)
+    qs = docs[rnd.integers(n, size=queries)] + 0.03 * rnd.standard_normal((queries, VECTOR_SIZE), dtype=np.float32)
+    qs /= np.linalg.norm(qs, axis=1, keepdims=True)
+    return docs, qs
+
+
+def _ram_mb(n: int, quantization: str, on_disk: bool, m: int) -> float:
+    originals = 0 if on_disk else n * VECTOR_SIZE * 4
+    quantized = {"none": 0, "int8": n * VECTOR_SIZE, "binary": n * VECTOR_SIZE // 8}[quantization]
+    return (originals + quantized + n * 2 * m * 4) / 2**20
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class _Simulated:
+    def __init__(self, docs: np.ndarray):
+        self.docs = docs
+        self.bound = np.quantile(np.abs(docs), 0.99)
+        self.int8 = np.round(np.clip(docs, -self.bound, self.bound) / self.bound * 127).astype(np.int8)
+        self.binary = np.where(docs > 0, 1, -1).astype(np.int8)
+
+    def search(self, q, quantization: str, oversampling: float, rescore: bool):
+        if quantization == "none":
+            return _top(self.docs @ q, LIMIT)
+        if quantization == "int8":
+            qq = np.round(np.clip(q, -self.bound, self.bound) / self.bound * 127).astype(np.int32)
+            approx = self.int8 @ qq
+        else:
+            approx = self.binary @ np.where(q > 0, 1, -1).astype(np.int32)
+        if not rescore:
+            return _top(approx.astype(np.float32), LIMIT)
+        candidates = _top(approx.astype(np.float32), int(LIMIT * oversampling))
+        return candidates[_top(self.docs[candidates] @ q, LIMIT)]
+
+
+def _run_simulated(docs, queries, m: int):
+    sim = _Simulated(docs)
+    truth = [set(_top(docs @ q, LIMIT)) for q in queries]
+    for label, quantization, on_disk, oversampling, rescore in SETTINGS:
+        hits, times = 0, []
+        for q, expected in zip(queries, truth):
+            t = time.perf_counter()
+            found = sim.search(q, quantization, oversampling, rescore)
+            times.append(time.perf_counter() - t)
+            hits += len(expected & set(found))
+        _report(label, len(docs), quantization, on_disk, m, hits / (LIMIT * len(queries)), times)
+
+
+def _run_qdrant(url: str, docs, queries, m: int, ef: int):
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models as qmodels
+
+    from core.config import settings
+    from knowledge.collection import create_collection, search_params
+
+    client = QdrantClient(url=url, timeout=600)
+    ids = [str(uuid.uuid4()) for _ in range(len(docs))]
+    settings.QDRANT_HNSW_M = m
+    settings.QDRANT_SEARCH_EF = ef
+    for label, quantization, on_disk, oversampling, rescore in SETTINGS:
+        settings.QDRANT_QUANTIZATION, settings.QDRANT_ON_DISK = quantization, on_disk
+        settings.QDRANT_OVERSAMPLING, settings.QDRANT_RESCORE = oversampling, rescore
+        name = f"bench_quant_{uuid.uuid4().hex[:8]}"
+        create_collection(client, name)
+        for start in range(0, len(docs), 1000):
+            client.upsert(name, points=qmodels.Batch(ids=ids[start:start + 1000], vectors=docs[start:start + 1000].tolist()))
+        while client.get_collection(name).status != qmodels.CollectionStatus.GREEN:
+            time.sleep(1)
+
+        params = search_params()
+        exact = qmodels.SearchParams(exact=True)
+        hits, times = 0, []
+        for q in queries:
+            expected = {p.id for p in client.query_points(name, query=q.tolist(), limit=LIMIT, search_params=exact).points}
+            t = time.perf_counter()
+            found = client.query_points(name, query=q.tolist(), limit=LIMIT, search_params=params).points
+            times.append(time.perf_counter() - t)
+            hits += len(expected & {p.id for p in found})
+        _report(label, len(docs), quantization, on_disk, m, hits / (LIMIT * len(queries)), times)
+        client.delete_collection(name)
+
+
+def _report(label, n, quantization, on_disk, m, recall, times):
+    arr = np.asarray(times) * 1000
+    print(
+        f"  {label:<22} RAM~{_ram_mb(n, quantization, on_disk, m):8.1f} MB  recall@{LIMIT}={recall:.3f}  "
+        f"p50={np.percentile(arr, 50):7.2f}ms  p99={np.percentile(arr, 99):7.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--m", type=int, default=16, help="HNSW graph degree")
+    parser.add_argument("--ef", type=int, default=0, help="search beam width (0 = server default)")
+    parser.add_argument("--qdrant-url", default=None)
+    args = parser.parse_args()
+
+    docs, queries = _dataset(args.points, args.queries)
+    print(f"{args.points} x {VECTOR_SIZE}-dim vectors, {args.queries} queries ({'qdrant ' + args.qdrant_url if args.qdrant_url else 'simulated'})")
+    if args.qdrant_url:
+        _run_qdrant(args.qdrant_url, docs, queries, args.m, args.ef)
+    else:
+        _run_simulated(docs, queries, args.m)
+
+
+if __name__ == "__main__":
+    main()
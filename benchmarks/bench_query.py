@@ -0,0 +1,114 @@
+# benchmarks/bench_query.py
+# ----------------------------------------------------
+# Document answering: retriever + retrieval chain (embeds and searches twice)
+# vs one embedding, one search and the stuff-documents chain
+#
+#   python -m benchmarks.bench_query --chunks 2000 --queries 50 --latency 0.05
+# ----------------------------------------------------
+
+import argparse
+import random
+import uuid
+
+from langchain.chains import create_retrieval_chain
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.prompts import PromptTemplate
+from langchain_openai import OpenAIEmbeddings
+from langchain_qdrant import Qdrant as QdrantVS
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from benchmarks.fakes import EMBEDDING_DIM, FakeOpenAIServer, fake_embedding
+from core.utils import StageTimer
+from knowledge.pipeline import COLLECTION_NAME, PROMPT_TEMPLATE, RETRIEVAL_K, PipelineCache, business_filter
+
+WORDS = "delivery refund warranty invoice store parking booking payment account size colour gift".split()
+
+
+def _load(client: QdrantClient, business_id: str, n: int, rnd: random.Random):
+    client.create_collection(
+        COLLECTION_NAME,
+        vectors_config=qmodels.VectorParams(size=EMBEDDING_DIM, distance=qmodels.Distance.COSINE),
+    )
+    texts = [" ".join(rnd.choice(WORDS) for _ in range(40)) + f" section {i}" for i in range(n)]
+    client.upsert(
+        COLLECTION_NAME,
+        points=[
+            qmodels.PointStruct(
+                id=i,
+                vector=fake_embedding(t),
+                payload={"business_id": business_id, "page_content": t, "chunk_index": i},
+            )
+            for i, t in enumerate(texts)
+        ],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="per-request latency of the embedding stand-in (s)")
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    business_id = str(uuid.uuid4())
+    client = QdrantClient(location=":memory:")
+    _load(client, business_id, args.chunks, rnd)
+    queries = [f"what about {rnd.choice(WORDS)} and {rnd.choice(WORDS)}" for _ in range(args.queries)]
+
+    llm = FakeListChatModel(responses=["answer"])
+    document_chain = create_stuff_documents_chain(
+        llm, PromptTemplate.from_template(PROMPT_TEMPLATE), document_variable_name="context"
+    )
+
+    with FakeOpenAIServer(latency=args.latency) as server:
+        embedder = OpenAIEmbeddings(
+            openai_api_key="bench",
+            openai_api_base=server.url,
+            check_embedding_ctx_length=False,
+        )
+
+        # Before: retriever.invoke for the guard, then the retrieval chain retrieves again
+        retriever = QdrantVS(
+            client=client,
+            collection_name=COLLECTION_NAME,
+            embeddings=embedder,
+            content_payload_key="page_content",
+            metadata_payload_key="metadata",
+        ).as_retriever(search_kwargs={"filter": business_filter(business_id), "k": RETRIEVAL_K})
+        retrieval_chain = create_retrieval_chain(retriever, document_chain)
+        before = StageTimer()
+        requests = server.requests
+        for q in queries:
+            with before.stage("retrieve"):
+                docs = retriever.invoke(q)
+            with before.stage("retrieve+generate"):
+                retrieval_chain.invoke({"input": q, "context": docs})
+        before_requests = server.requests - requests
+
+        # After: embed once, search once, filtered docs straight into the chain
+        cache = PipelineCache(client, ttl_seconds=3600, max_businesses=10)
+        cache._document_chain = document_chain
+        pipeline = cache.get(business_id)
+        after = StageTimer()
+        requests = server.requests
+        for q in queries:
+            with after.stage("embed"):
+                vector = embedder.embed_query(q)
+            with after.stage("search"):
+                docs = pipeline.search(vector)
+            with after.stage("generate"):
+                pipeline.generate(q, docs)
+        after_requests = server.requests - requests
+
+    n = len(queries)
+    for label, timer, reqs in (("before", before, before_requests), ("after", after, after_requests)):
+        stages = "  ".join(f"{name}={ms / n:.1f}" for name, ms in timer.stages.items())
+        print(f"{label:<7} {timer.total / n:7.1f} ms/query  embedding requests/query={reqs / n:.0f}  [{stages}]")
+    print(f"speedup: {before.total / after.total:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
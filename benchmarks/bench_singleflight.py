@@ -0,0 +1,56 @@
+# benchmarks/bench_singleflight.py
+# ----------------------------------------------------
+# Promo burst: many visitors asking the same question at once
+#
+# Fires N concurrent copies of one question (varying only in case and
+# whitespace) at the async query path, with and without single-flight
+# coalescing, and counts the upstream OpenAI requests (embedding + chat)
+# each run made. The answer cache is off, so only coalescing is measured.
+#
+#   python -m benchmarks.bench_singleflight --concurrency 100 --chat-latency 1.0
+# ----------------------------------------------------
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from benchmarks.bench_async_query import _setup_service
+from benchmarks.fakes import FakeOpenAIServer
+
+
+async def _burst(service, business_id: str, n: int):
+    variants = ("What are your opening hours?", "what are your opening hours?", "  What are your opening hours?  ")
+    start = time.perf_counter()
+    results = await asyncio.gather(*(service.aanswer_query(business_id, variants[i % len(variants)]) for i in range(n)))
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="embedding request latency (s)")
+    parser.add_argument("--chat-latency", type=float, default=1.0, help="chat completion latency (s)")
+    args = parser.parse_args()
+
+    business_id = str(uuid.uuid4())
+    with FakeOpenAIServer(latency=args.latency, chat_latency=args.chat_latency, token_latency=0) as server:
+        service = _setup_service(server, business_id, args.chunks)
+        from core.config import settings
+        from knowledge.singleflight import query_flights
+
+        for enabled in (False, True):
+            settings.SINGLE_FLIGHT_ENABLED = enabled
+            before = server.requests
+            elapsed, results = asyncio.run(_burst(service, business_id, args.concurrency))
+            errors = sum(1 for r in results if r["result"]["response"]["source"] == "error")
+            print(
+                f"single-flight {'on ' if enabled else 'off'}  {args.concurrency} queries in {elapsed:6.2f}s  "
+                f"upstream requests={server.requests - before}" + (f"  errors={errors}" if errors else "")
+            )
+        print(f"  {query_flights.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_tenants.py
+# ----------------------------------------------------
+# Filtered search latency as the number of businesses grows
+#
+#   python -m benchmarks.bench_tenants --qdrant-url http://localhost:6333 --tenants 10 100 1000
+#
+# Builds one collection per layout (global HNSW + business_id filter vs
+# per-tenant graphs on an is_tenant index) through knowledge.collection,
+# grows it tenant by tenant with --points-per-tenant vectors each, and at
+# every step times business-filtered top-8 searches. With the per_tenant
+# layout the latency should stay flat while the global graph's degrades.
+#
+# Without --qdrant-url it falls back to Qdrant's local mode, which ignores
+# HNSW and index settings; use it only to smoke-test the script.
+# ----------------------------------------------------
+
+import argparse
+import random
+import time
+import uuid
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from core.config import settings
+from knowledge.collection import VECTOR_SIZE, create_collection
+from knowledge.pipeline import business_filter
+
+
+def _wait_green(client, name: str):
+    while client.get_collection(name).status != qmodels.CollectionStatus.GREEN:
+        time.sleep(0.5)
+
+
+def _add_tenants(client, name: str, tenants: list, per_tenant: int, rnd):
+    for business_id in tenants:
+        # Each business has its own topic, like a real knowledge base
+        center = rnd.standard_normal(VECTOR_SIZE, dtype=np.float32)
+        vectors = center + rnd.standard_normal((per_tenant, VECTOR_SIZE), dtype=np.float32)
+        client.upsert(
+            name,
+            points=qmodels.Batch(
+                ids=[str(uuid.uuid4()) for _ in range(per_tenant)],
+                vectors=vectors.tolist(),
+                payloads=[{"business_id": business_id, "chunk_index": i} for i in range(per_tenant)],
+            ),
+            wait=True,
+        )
+
+
+def _time_searches(client, name: str, tenants: list, queries: int, rnd):
+    samples = []
+    for _ in range(queries):
+        q = rnd.standard_normal(VECTOR_SIZE, dtype=np.float32).tolist()
+        flt = business_filter(random.choice(tenants))
+        t = time.perf_counter()
+        client.query_points(name, query=q, query_filter=flt, limit=8)
+        samples.append(time.perf_counter() - t)
+    arr = np.asarray(samples) * 1000
+    return np.percentile(arr, 50), np.percentile(arr, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tenants", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--points-per-tenant", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--qdrant-url", default=None)
+    args = parser.parse_args()
+
+    client = QdrantClient(url=args.qdrant_url, timeout=600) if args.qdrant_url else QdrantClient(location=":memory:")
+    if not args.qdrant_url:
+        print("⚠️ Local mode: HNSW and tenant indexes are not simulated, numbers are brute force")
+
+    for layout in ("global", "per_tenant"):
+        settings.QDRANT_TENANT_LAYOUT = layout
+        rnd = np.random.default_rng(7)
+        name = f"bench_tenants_{uuid.uuid4().hex[:8]}"
+        create_collection(client, name)
+        tenants = []
+        for target in sorted(args.tenants):
+            new = [str(uuid.uuid4()) for _ in range(target - len(tenants))]
+            _add_tenants(client, name, new, args.points_per_tenant, rnd)
+            tenants += new
+            _wait_green(client, name)
+            p50, p99 = _time_searches(client, name, tenants, args.queries, rnd)
+            print(
+                f"  {layout:<10} {len(tenants):>6} tenants {len(tenants) * args.points_per_tenant:>8} points  "
+                f"p50={p50:7.2f}ms  p99={p99:7.2f}ms"
+            )
+        client.delete_collection(name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# benchmarks/fakes.py
+# ----------------------------------------------------
+# Deterministic local stand-ins for external services
+# ----------------------------------------------------
+
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIM = 1536
+_WORD_RE = re.compile(r"\w+")
+
+
+def fake_embedding(text, dim: int = EMBEDDING_DIM):
+    """Hashed bag-of-words vector: texts sharing words get similar vectors."""
+    if not isinstance(text, str):
+        text = " ".join(str(t) for t in text)
+    vec = [0.0] * dim
+    for word in _WORD_RE.findall(text.lower()) or [text]:
+        h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 32) & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+class FakeOpenAIServer:
+    """
+    OpenAI-compatible HTTP server on localhost.
+    Embedding requests sleep `latency + per_item_latency * len(inputs)` seconds.
+    Chat completions wait `chat_latency` before the first token and
+    `token_latency` per token after it, streamed or not.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        per_item_latency: float = 0.0002,
+        dim: int = EMBEDDING_DIM,
+        chat_latency: float = 0.3,
+        token_latency: float = 0.02,
+        answer: str = "This is a generated answer from the business documents.",
+    ):
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.dim = dim
+        self.chat_latency = chat_latency
+        self.token_latency = token_latency
+        self.answer = answer
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _track(self, delta: int):
+        with self._lock:
+            if delta > 0:
+                self.requests += 1
+            self.in_flight += delta
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _embeddings(self, body: dict) -> dict:
+        inputs = body.get("input")
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        time.sleep(self.latency + self.per_item_latency * len(inputs))
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(t, self.dim)}
+                for i, t in enumerate(inputs)
+            ],
+            "model": body.get("model", "text-embedding-ada-002"),
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+        }
+
+    def _chat_tokens(self):
+        return [w + " " for w in self.answer.split(" ")]
+
+    def _chat_completion(self, body: dict) -> dict:
+        tokens = self._chat_tokens()
+        time.sleep(self.chat_latency + self.token_latency * len(tokens))
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-3.5-turbo"),
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}
+            ],
+            "usage": {"prompt_tokens": 1, "completion_tokens": len(tokens), "total_tokens": len(tokens) + 1},
+        }
+
+    def _chat_chunks(self, body: dict):
+        """Server-sent chat.completion.chunk payloads, paced like a real model."""
+        base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": body.get("model", "gpt-3.5-turbo")}
+        time.sleep(self.chat_latency)
+        yield {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}
+        for token in self._chat_tokens():
+            yield {**base, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            time.sleep(self.token_latency)
+        yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, chunks):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for chunk in chunks:
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                fake._track(1)
+                try:
+                    if self.path.endswith("/embeddings"):
+                        self._send_json(200, fake._embeddings(body))
+                    elif self.path.endswith("/chat/completions") and body.get("stream"):
+                        self._send_stream(fake._chat_chunks(body))
+                    elif self.path.endswith("/chat/completions"):
+                        self._send_json(200, fake._chat_completion(body))
+                    else:
+                        self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+                finally:
+                    fake._track(-1)
+
+        return Handler
+
+
+class FakeCalendlyServer:
+    """
+    Calendly OAuth + API stand-in on localhost. Every request sleeps `latency`
+    seconds. Serves the token endpoint (authorization_code / refresh_token),
+    the event type list and single event types.
+    """
+
+    def __init__(self, latency: float = 0.05, event_types: int = 5):
+        self.latency = latency
+        self.event_types = event_types
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _event_type(self, i: int) -> dict:
+        return {
+            "uri": f"{self.url}/event_types/ET{i}",
+            "name": f"Consultation {i}",
+            "slug": f"consultation-{i}",
+            "kind": "solo",
+            "scheduling_url": f"https://calendly.example/bench/consultation-{i}",
+            "active": True,
+        }
+
+    def _token(self) -> dict:
+        return {
+            "access_token": f"access-{time.time_ns()}",
+            "refresh_token": "refresh-bench",
+            "token_type": "Bearer",
+            "expires_in": 7200,
+            "scope": "default",
+            "owner": f"{self.url}/users/BENCH",
+            "organization": f"{self.url}/organizations/BENCH",
+        }
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict):
+                with fake._lock:
+                    fake.requests += 1
+                time.sleep(fake.latency)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.path.startswith("/oauth/token"):
+                    self._send_json(200, fake._token())
+                else:
+                    self._send_json(404, {"message": f"unknown path {self.path}"})
+
+            def do_GET(self):
+                if not (self.headers.get("Authorization") or "").startswith("Bearer "):
+                    self._send_json(401, {"message": "Unauthenticated"})
+                elif self.path.startswith("/event_types/"):
+                    i = self.path.rsplit("ET", 1)[-1]
+                    self._send_json(200, {"resource": fake._event_type(int(i) if i.isdigit() else 0)})
+                elif self.path.startswith("/event_types"):
+                    self._send_json(200, {"collection": [fake._event_type(i) for i in range(fake.event_types)]})
+                else:
+                    self._send_json(404, {"message": f"unknown path {self.path}"})
+
+        return Handler
@@ -4,11 +4,106 @@ load_dotenv()
 
 class Settings:
     DATABASE_URL = os.getenv("DATABASE_URL")
+    # Defaults to DATABASE_URL with the asyncpg driver
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
     JWT_SECRET = os.getenv("JWT_SECRET")
     JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+    # ":memory:" runs Qdrant in-process (benchmarks, offline development)
     QDRANT_URL = os.getenv("QDRANT_URL")
+    # chatflow_vectors storage (knowledge/collection.py): none | int8 | binary
+    QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none")
+    QDRANT_ON_DISK = os.getenv("QDRANT_ON_DISK", "false").lower() == "true"
+    QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", 16))
+    QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", 100))
+    # global | per_tenant (business_id tenant index, one HNSW graph per business)
+    QDRANT_TENANT_LAYOUT = os.getenv("QDRANT_TENANT_LAYOUT", "global")
+    # Query side: beam width (0 = server default), quantized candidates per result, rescoring
+    QDRANT_SEARCH_EF = int(os.getenv("QDRANT_SEARCH_EF", 0))
+    QDRANT_OVERSAMPLING = float(os.getenv("QDRANT_OVERSAMPLING", 2.0))
+    QDRANT_RESCORE = os.getenv("QDRANT_RESCORE", "true").lower() == "true"
+
+    # Embedding batches sent to OpenAI during training
+    EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 128))
+    EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", 60000))
+    EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", 4))
+    EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 3))
+
+    # Streaming Qdrant upserts during training
+    QDRANT_UPSERT_BATCH_SIZE = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", 64))
+    QDRANT_UPSERT_IN_FLIGHT = int(os.getenv("QDRANT_UPSERT_IN_FLIGHT", 3))
+    QDRANT_UPSERT_WAIT = os.getenv("QDRANT_UPSERT_WAIT", "true").lower() == "true"
+
+    # On-disk embedding cache shared by training and queries
+    EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+    EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", ".cache/embeddings.sqlite3")
+    EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", 1024))
+    EMBED_CACHE_MEMORY_ITEMS = int(os.getenv("EMBED_CACHE_MEMORY_ITEMS", 10000))
+
+    # Extracted document text lives in zstd blobs, not in Knowledge.content
+    BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", ".data/blobs")
+    BLOB_ZSTD_LEVEL = int(os.getenv("BLOB_ZSTD_LEVEL", 10))
+
+    # Document extraction process pool (1 worker = always in-process)
+    EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", os.cpu_count() or 1))
+    EXTRACT_PARALLEL_MIN_PAGES = int(os.getenv("EXTRACT_PARALLEL_MIN_PAGES", 200))
+    EXTRACT_PARALLEL_MIN_DOCX_MB = float(os.getenv("EXTRACT_PARALLEL_MIN_DOCX_MB", 10))
+    EXTRACT_PAGES_PER_TASK = int(os.getenv("EXTRACT_PAGES_PER_TASK", 100))
+
+    # In-memory manual Q/A match index
+    QA_INDEX_TTL_SECONDS = int(os.getenv("QA_INDEX_TTL_SECONDS", 60))
+    QA_INDEX_MAX_BUSINESSES = int(os.getenv("QA_INDEX_MAX_BUSINESSES", 1000))
+    # Paraphrase matching: cosine similarity between query and stored question embeddings
+    QA_SEMANTIC_ENABLED = os.getenv("QA_SEMANTIC_ENABLED", "true").lower() == "true"
+    QA_SEMANTIC_THRESHOLD = float(os.getenv("QA_SEMANTIC_THRESHOLD", 0.92))
+
+    # Background training jobs: "inprocess" runs workers inside the API,
+    # "external" leaves them to `python -m knowledge.worker`
+    TRAIN_WORKER_MODE = os.getenv("TRAIN_WORKER_MODE", "inprocess")
+    TRAIN_WORKERS = int(os.getenv("TRAIN_WORKERS", 2))
+    TRAIN_POLL_SECONDS = float(os.getenv("TRAIN_POLL_SECONDS", 2))
+    TRAIN_JOB_STALE_SECONDS = int(os.getenv("TRAIN_JOB_STALE_SECONDS", 600))
+    # Running jobs touch updated_at this often; keep it well under the stale timeout
+    TRAIN_HEARTBEAT_SECONDS = float(os.getenv("TRAIN_HEARTBEAT_SECONDS", 30))
+
+    # Cached per-business retrieval pipelines (rebuilt after training or on TTL)
+    PIPELINE_CACHE_TTL_SECONDS = int(os.getenv("PIPELINE_CACHE_TTL_SECONDS", 300))
+    PIPELINE_CACHE_MAX_BUSINESSES = int(os.getenv("PIPELINE_CACHE_MAX_BUSINESSES", 1000))
+
+    # In-process search for small businesses: memory-mapped snapshots of their
+    # points, refreshed by training; larger businesses always query Qdrant
+    LOCAL_INDEX_ENABLED = os.getenv("LOCAL_INDEX_ENABLED", "false").lower() == "true"
+    LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", ".data/local_index")
+    LOCAL_INDEX_MAX_POINTS = int(os.getenv("LOCAL_INDEX_MAX_POINTS", 2000))
+
+    # Hybrid retrieval: per-business BM25 index built by training, fused with
+    # the vector results by reciprocal rank fusion
+    LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "true").lower() == "true"
+    LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", ".data/lexical")
+    HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))
+    RRF_K = int(os.getenv("RRF_K", 60))
+
+    # Prompt context: token budget for retrieved passages, and how much of a
+    # passage may already be covered by a better one before it is dropped
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500))
+    CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", 0.8))
+
+    # Semantic answer cache: reuse a generated answer for a near-identical query
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+    ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", 900))
+    ANSWER_CACHE_ENTRIES = int(os.getenv("ANSWER_CACHE_ENTRIES", 256))
+    ANSWER_CACHE_MAX_BUSINESSES = int(os.getenv("ANSWER_CACHE_MAX_BUSINESSES", 500))
+
+    # Knowledge version stamps (knowledge_versions table) are re-read at most this often per process
+    KNOWLEDGE_VERSION_REFRESH_SECONDS = float(os.getenv("KNOWLEDGE_VERSION_REFRESH_SECONDS", 1.0))
+
+    # Identical queries in flight at the same time share one computation
+    SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+    # Prometheus metrics at /metrics (per-stage histograms, answer/token/error counters)
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
 
 settings = Settings()
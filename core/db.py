@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from core.config import settings
@@ -13,3 +14,58 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# -----------------------------------------------------
+# Schema upgrades
+# -----------------------------------------------------
+# create_all only creates missing tables; columns added to existing tables
+# are listed here. Every statement is idempotent and runs at startup.
+SCHEMA_UPGRADES = [
+    "ALTER TABLE knowledge ADD COLUMN IF NOT EXISTS content_hash varchar(64)",
+    "CREATE INDEX IF NOT EXISTS ix_knowledge_content_hash ON knowledge (content_hash)",
+]
+
+def upgrade_schema(bind=engine):
+    if bind.dialect.name != "postgresql":
+        # Other databases (local SQLite) are created fresh by create_all
+        return
+    with bind.begin() as conn:
+        for statement in SCHEMA_UPGRADES:
+            conn.execute(text(statement))
+
+
+# -----------------------------------------------------
+# Async sessions (async query path)
+# -----------------------------------------------------
+_ASYNC_DRIVERS = {
+    "postgresql+psycopg2://": "postgresql+asyncpg://",
+    "postgresql://": "postgresql+asyncpg://",
+    "postgres://": "postgresql+asyncpg://",
+}
+
+def async_database_url() -> str:
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = settings.DATABASE_URL
+    for prefix, driver in _ASYNC_DRIVERS.items():
+        if url.startswith(prefix):
+            return driver + url[len(prefix):]
+    return url
+
+_async_session_factory = None
+
+def AsyncSessionLocal() -> AsyncSession:
+    # The engine is created on first use so sync-only processes never need the async driver
+    global _async_session_factory
+    if _async_session_factory is None:
+        _async_session_factory = async_sessionmaker(
+            create_async_engine(async_database_url()),
+            autoflush=False,
+            expire_on_commit=False,
+        )
+    return _async_session_factory()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,197 @@
+# core/metrics.py
+# ----------------------------------------------------
+# Prometheus metrics (text exposition format, no client library)
+# ----------------------------------------------------
+#
+# Per-stage timings come from the StageTimer spans the query and training
+# paths already keep; at the end of a request they are observed into
+#
+#   chatflow_stage_duration_seconds{path, stage, tier}    histogram
+#   chatflow_request_duration_seconds{path, tier}         histogram
+#   chatflow_ttft_seconds{path, tier}                     histogram (time to first streamed token)
+#   chatflow_answers_total{source}                        counter (manual_qa, cache, documents, ...)
+#   chatflow_llm_tokens_total{kind}                       counter (prompt / completion, estimated)
+#   chatflow_errors_total{path}                           counter
+#
+# plus cache and coalescing counters read from their stats() at scrape time.
+# `tier` buckets a business by its number of chunks. observe_timer also
+# prints the request's timing line, metrics or not. With METRICS_ENABLED off
+# every record call returns right away and /metrics is 404.
+
+import bisect
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from core.config import settings
+
+ENABLED = settings.METRICS_ENABLED
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+# Upper bounds (chunks) of the business tiers
+TIERS = ((1000, "small"), (10000, "medium"))
+_MAX_TRACKED_BUSINESSES = 100000
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((k, list(v)) for k, v in self._series.items())
+        for values, data in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets, data):
+                cumulative += n
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labels, values, le)} {cumulative}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labels, values, inf)} {data[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, values)} {data[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labels, values)} {data[-1]}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "chatflow_stage_duration_seconds", "Time spent in one stage of a query or training run.", ("path", "stage", "tier")
+)
+REQUEST_SECONDS = Histogram(
+    "chatflow_request_duration_seconds", "End-to-end time of a query or training run.", ("path", "tier")
+)
+TTFT_SECONDS = Histogram(
+    "chatflow_ttft_seconds", "Time from receiving a streamed query to its first answer token.", ("path", "tier")
+)
+ANSWERS = Counter("chatflow_answers_total", "Answers by where they came from.", ("source",))
+LLM_TOKENS = Counter("chatflow_llm_tokens_total", "LLM tokens (estimated with the embedding tokenizer).", ("kind",))
+ERRORS = Counter("chatflow_errors_total", "Failed queries and training runs.", ("path",))
+_METRICS = (STAGE_SECONDS, REQUEST_SECONDS, TTFT_SECONDS, ANSWERS, LLM_TOKENS, ERRORS)
+
+# Callables returning (name, help, type, [(labels dict, value), ...]), evaluated at scrape time
+_collectors: List[Callable[[], Iterable[tuple]]] = []
+
+_business_sizes: "OrderedDict[str, int]" = OrderedDict()
+_sizes_lock = threading.Lock()
+
+
+# ------------------------------------------------
+# Business tiers
+# ------------------------------------------------
+def set_business_size(business_id, points: int):
+    if not ENABLED:
+        return
+    with _sizes_lock:
+        _business_sizes[str(business_id)] = points
+        _business_sizes.move_to_end(str(business_id))
+        while len(_business_sizes) > _MAX_TRACKED_BUSINESSES:
+            _business_sizes.popitem(last=False)
+
+
+def knows_business(business_id) -> bool:
+    return str(business_id) in _business_sizes
+
+
+def business_tier(business_id) -> str:
+    points = _business_sizes.get(str(business_id))
+    if points is None:
+        return "unknown"
+    for bound, tier in TIERS:
+        if points <= bound:
+            return tier
+    return "large"
+
+
+# ------------------------------------------------
+# Recording
+# ------------------------------------------------
+def observe_timer(path: str, business_id, timer, error: bool = False, ttft_ms: float = None):
+    """Log a finished StageTimer and feed its spans (and the TTFT, if streamed) into the histograms."""
+    ttft = f" ttft={ttft_ms:.1f}ms" if ttft_ms is not None else ""
+    print(f"⏱️ {path.capitalize()} timings:{ttft} {timer}")
+    if not ENABLED:
+        return
+    tier = business_tier(business_id)
+    for stage, ms in timer.stages.items():
+        STAGE_SECONDS.observe(ms / 1000, path, stage, tier)
+    REQUEST_SECONDS.observe(timer.elapsed_ms() / 1000, path, tier)
+    if ttft_ms is not None:
+        TTFT_SECONDS.observe(ttft_ms / 1000, path, tier)
+    if error:
+        ERRORS.inc(path)
+
+
+def count_answer(source: str, prompt_tokens: int = 0, completion_tokens: int = 0):
+    if not ENABLED:
+        return
+    ANSWERS.inc(source)
+    if prompt_tokens:
+        LLM_TOKENS.inc("prompt", amount=prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.inc("completion", amount=completion_tokens)
+
+
+def register_collector(fn: Callable[[], Iterable[tuple]]):
+    _collectors.append(fn)
+
+
+# ------------------------------------------------
+# Exposition
+# ------------------------------------------------
+def render() -> str:
+    lines = []
+    for metric in _METRICS:
+        lines += metric.render()
+    for collect in _collectors:
+        try:
+            for name, help, kind, samples in collect():
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+                for labels, value in samples:
+                    label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                    lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        except Exception as e:
+            print(f"⚠️ Metrics collector failed: {e}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,75 @@
+import io
+import os
+import tempfile
+from typing import Iterable, Iterator
+
+import zstandard as zstd
+
+from core.config import settings
+
+BLOB_SCHEME = "blob://"
+
+
+class LocalBlobStore:
+    """
+    zstd-compressed text blobs on the local filesystem, addressed as
+    blob://<key>. Stands in for object storage: callers only see put/open/delete.
+    """
+
+    def __init__(self, root: str, level: int = 10):
+        self.root = os.path.abspath(root)
+        self.level = level
+
+    def _path(self, url: str) -> str:
+        if not url.startswith(BLOB_SCHEME):
+            raise ValueError(f"Not a blob URL: {url}")
+        path = os.path.abspath(os.path.join(self.root, url[len(BLOB_SCHEME):]))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Blob key escapes the store: {url}")
+        return path
+
+    def exists(self, url: str) -> bool:
+        return os.path.exists(self._path(url))
+
+    def put_text(self, key: str, pieces: Iterable[str]) -> str:
+        """Compress text pieces into blob `key` as they arrive; returns its URL."""
+        url = BLOB_SCHEME + key
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                with zstd.ZstdCompressor(level=self.level).stream_writer(fh, closefd=False) as writer:
+                    for piece in pieces:
+                        writer.write(piece.encode("utf-8"))
+            os.replace(tmp_path, path)  # readers never see a half-written blob
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return url
+
+    def open_text(self, url: str, block_chars: int = 64 * 1024) -> Iterator[str]:
+        """Stream a blob back as decompressed text blocks."""
+        with open(self._path(url), "rb") as fh:
+            reader = io.TextIOWrapper(zstd.ZstdDecompressor().stream_reader(fh), encoding="utf-8")
+            while True:
+                block = reader.read(block_chars)
+                if not block:
+                    return
+                yield block
+
+    def read_text(self, url: str) -> str:
+        return "".join(self.open_text(url))
+
+    def size(self, url: str) -> int:
+        return os.path.getsize(self._path(url))
+
+    def delete(self, url: str):
+        try:
+            os.remove(self._path(url))
+        except FileNotFoundError:
+            pass
+
+
+blob_store = LocalBlobStore(settings.BLOB_STORE_DIR, level=settings.BLOB_ZSTD_LEVEL)
@@ -0,0 +1,36 @@
+import json
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Wall-clock milliseconds spent in each named stage of one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the timer was created (e.g. time to first token)."""
+        return (time.perf_counter() - self.started) * 1000
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    @property
+    def total(self) -> float:
+        return sum(self.stages.values())
+
+    def __str__(self):
+        parts = [f"{name}={ms:.1f}ms" for name, ms in self.stages.items()]
+        return " ".join(parts + [f"total={self.total:.1f}ms"])
+
+
+def sse_event(event: str, data) -> str:
+    """One Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,185 @@
+# knowledge/answer_cache.py
+# ----------------------------------------------------
+# Semantic answer cache (recent query embeddings per business)
+# ----------------------------------------------------
+#
+# Generated document answers are kept next to the L2-normalised embedding of
+# the query that produced them. A later query whose embedding is within
+# ANSWER_CACHE_THRESHOLD cosine similarity gets the cached answer without a
+# vector search or an LLM call, provided both queries carry the same numbers
+# and codes: "price of SKU-1234" and "price of SKU-1235" embed almost
+# identically but must not share an answer. A business's cache is tied to
+# its shared Q/A and vectors version stamps (knowledge/versions.py), so
+# training or a Q/A add/delete in any process empties it; entries also
+# expire after ANSWER_CACHE_TTL_SECONDS.
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from knowledge import versions
+from knowledge.lexical import identifier_tokens
+
+
+def _normalize(vector) -> np.ndarray:
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(arr)
+    return arr / norm if norm else arr
+
+
+def knowledge_stamp(business_id) -> Tuple[int, int]:
+    return versions.get_stamp(business_id)
+
+
+class BusinessAnswerCache:
+    """
+    Up to `capacity` (query vector, identifier tokens, answer) rows; the least
+    recently used row is overwritten when full.
+    """
+
+    def __init__(self, dim: int, capacity: int, stamp: Tuple[int, int]):
+        self.stamp = stamp
+        self.capacity = capacity
+        self._matrix = np.empty((0, dim), dtype=np.float32)
+        self._answers = []
+        self._identifiers = []
+        self._stored_at = np.empty(0, dtype=np.float64)
+        self._last_used = np.empty(0, dtype=np.float64)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def lookup(
+        self, vector: np.ndarray, identifiers: frozenset, threshold: float, ttl_seconds: float
+    ) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            if not self._size:
+                return None
+            now = time.monotonic()
+            scores = self._matrix[: self._size] @ vector
+            scores[self._stored_at[: self._size] < now - ttl_seconds] = -np.inf
+            scores[[i for i, ids in enumerate(self._identifiers) if ids != identifiers]] = -np.inf
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < threshold:
+                return None
+            self._last_used[best] = now
+            return self._answers[best], score
+
+    def store(self, vector: np.ndarray, identifiers: frozenset, answer: str):
+        with self._lock:
+            now = time.monotonic()
+            if self._size < self.capacity:
+                if self._size == self._matrix.shape[0]:
+                    self._grow(min(self.capacity, max(16, 2 * self._size)), vector.shape[0])
+                row = self._size
+                self._size += 1
+                self._answers.append(answer)
+                self._identifiers.append(identifiers)
+            else:
+                row = int(np.argmin(self._last_used[: self._size]))
+                self._answers[row] = answer
+                self._identifiers[row] = identifiers
+            self._matrix[row] = vector
+            self._stored_at[row] = now
+            self._last_used[row] = now
+
+    def _grow(self, rows: int, dim: int):
+        matrix = np.empty((rows, dim), dtype=np.float32)
+        matrix[: self._size] = self._matrix[: self._size]
+        self._matrix = matrix
+        self._stored_at = np.resize(self._stored_at, rows)
+        self._last_used = np.resize(self._last_used, rows)
+
+
+class AnswerCache:
+    """One BusinessAnswerCache per business, least recently used businesses dropped first."""
+
+    def __init__(self, threshold: float, ttl_seconds: int, capacity: int, max_businesses: int):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.capacity = capacity
+        self.max_businesses = max_businesses
+        self._caches: "OrderedDict[str, BusinessAnswerCache]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _cache(self, key: str, stamp: Tuple[int, int], dim: int, create: bool) -> Optional[BusinessAnswerCache]:
+        with self._lock:
+            cache = self._caches.get(key)
+            if cache is not None and cache.stamp != stamp:
+                # The business's knowledge changed since these answers were generated
+                del self._caches[key]
+                cache = None
+            if cache is None and create:
+                cache = self._caches[key] = BusinessAnswerCache(dim, self.capacity, stamp)
+                while len(self._caches) > self.max_businesses:
+                    self._caches.popitem(last=False)
+            if cache is not None:
+                self._caches.move_to_end(key)
+            return cache
+
+    def lookup(
+        self, business_id, query: str, query_vector, stamp: Optional[Tuple[int, int]] = None
+    ) -> Optional[Tuple[str, float]]:
+        """
+        Cached (answer, similarity) for a query close enough to an earlier one,
+        with the same identifiers. `stamp` defaults to knowledge_stamp() now.
+        """
+        vector = _normalize(query_vector)
+        stamp = stamp or knowledge_stamp(business_id)
+        cache = self._cache(str(business_id), stamp, vector.shape[0], create=False)
+        hit = None
+        if cache is not None:
+            hit = cache.lookup(vector, identifier_tokens(query), self.threshold, self.ttl_seconds)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return hit
+
+    def store(
+        self,
+        business_id,
+        query: str,
+        query_vector,
+        answer: str,
+        stamp: Tuple[int, int],
+        current: Optional[Tuple[int, int]] = None,
+    ):
+        """
+        Remember an answer. `stamp` is knowledge_stamp() taken before retrieval
+        and `current` the one now (read here if not given); answers generated
+        from knowledge that has since changed are not cached.
+        """
+        if stamp != (current or knowledge_stamp(business_id)):
+            return
+        vector = _normalize(query_vector)
+        self._cache(str(business_id), stamp, vector.shape[0], create=True).store(vector, identifier_tokens(query), answer)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "businesses": len(self._caches),
+                "entries": sum(len(c) for c in self._caches.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+answer_cache = AnswerCache(
+    threshold=settings.ANSWER_CACHE_THRESHOLD,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    capacity=settings.ANSWER_CACHE_ENTRIES,
+    max_businesses=settings.ANSWER_CACHE_MAX_BUSINESSES,
+)
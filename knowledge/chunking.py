@@ -0,0 +1,38 @@
+# knowledge/chunking.py
+# ----------------------------------------------------
+# Incremental chunking over a stream of text pieces
+# ----------------------------------------------------
+
+from typing import Iterable, Iterator
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+# How much text is buffered before the splitter runs
+WINDOW_CHARS = CHUNK_SIZE * 16
+
+
+def make_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+
+def iter_chunks(pieces: Iterable[str], splitter=None, window_chars: int = WINDOW_CHARS) -> Iterator[str]:
+    """
+    Split a stream of pages into chunks without materialising the whole text.
+    The last chunk of every window is carried over so it can grow with the
+    next page, which keeps chunk boundaries close to a whole-text split.
+    """
+    splitter = splitter or make_splitter()
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        if len(buffer) < window_chars:
+            continue
+        chunks = splitter.split_text(buffer)
+        if len(chunks) < 2:
+            continue
+        yield from chunks[:-1]
+        buffer = chunks[-1]
+    if buffer.strip():
+        yield from splitter.split_text(buffer)
@@ -0,0 +1,253 @@
+# knowledge/collection.py
+# ----------------------------------------------------
+# Qdrant layout of chatflow_vectors (vectors, quantization, HNSW)
+# ----------------------------------------------------
+#
+#   QDRANT_QUANTIZATION   none | int8 | binary
+#                         int8 keeps 1 byte per dimension in RAM (4x smaller),
+#                         binary 1 bit (32x smaller; suits 1536-dim OpenAI vectors)
+#   QDRANT_ON_DISK        originals are memory-mapped from disk; with
+#                         quantization only the quantized copy must stay in RAM
+#   QDRANT_HNSW_M / QDRANT_HNSW_EF_CONSTRUCT   graph degree / build beam
+#   QDRANT_TENANT_LAYOUT  global     one HNSW graph over all businesses, searched
+#                                    with a business_id filter
+#                         per_tenant business_id is a tenant index: points are
+#                                    stored grouped by business and every business
+#                                    gets its own small graph (payload_m), with no
+#                                    global graph (m=0). Every query here filters
+#                                    by business_id, so none needs the global one.
+#
+# Quantized search over-fetches `limit * QDRANT_OVERSAMPLING` candidates and,
+# with QDRANT_RESCORE, re-ranks them by the original vectors, which brings
+# recall back close to unquantized search.
+#
+# New collections are created with these settings by ensure_collection and
+# qdrant_clean.py. An existing collection is switched in place with
+#   python -m knowledge.collection
+# (Qdrant re-quantizes and rebuilds its segments in the background), which
+# refuses to change the tenant layout. That needs the points re-laid out:
+#   python -m knowledge.collection migrate
+# copies them into a new collection and points the chatflow_vectors alias at it.
+#   python -m knowledge.collection alias <collection>
+# points the alias at a collection by hand (recovering an interrupted migration).
+
+import argparse
+import time
+from typing import Optional
+
+from qdrant_client.http import models as qmodels
+
+from core.config import settings
+
+COLLECTION_NAME = "chatflow_vectors"
+VECTOR_SIZE = 1536
+# Payload fields that get a keyword index (tenant + per-source deletes)
+PAYLOAD_INDEX_FIELDS = ("business_id", "knowledge_id", "qa_id")
+QUANTIZATION_MODES = ("none", "int8", "binary")
+TENANT_LAYOUTS = ("global", "per_tenant")
+
+
+def per_tenant() -> bool:
+    layout = settings.QDRANT_TENANT_LAYOUT.lower()
+    if layout not in TENANT_LAYOUTS:
+        raise ValueError(f"QDRANT_TENANT_LAYOUT must be one of {TENANT_LAYOUTS}, got {layout!r}")
+    return layout == "per_tenant"
+
+
+def collection_layout(client, collection_name: str = COLLECTION_NAME) -> str:
+    """Tenant layout an existing collection was built with: no global graph means per_tenant."""
+    hnsw = client.get_collection(collection_name).config.hnsw_config
+    return "per_tenant" if hnsw.m == 0 and hnsw.payload_m else "global"
+
+
+def quantization_config(mode: str = None):
+    mode = (mode or settings.QDRANT_QUANTIZATION).lower()
+    if mode == "none":
+        return None
+    if mode == "int8":
+        return qmodels.ScalarQuantization(
+            scalar=qmodels.ScalarQuantizationConfig(type=qmodels.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if mode == "binary":
+        return qmodels.BinaryQuantization(binary=qmodels.BinaryQuantizationConfig(always_ram=True))
+    raise ValueError(f"QDRANT_QUANTIZATION must be one of {QUANTIZATION_MODES}, got {mode!r}")
+
+
+def vectors_config(on_disk: bool = None) -> qmodels.VectorParams:
+    return qmodels.VectorParams(
+        size=VECTOR_SIZE,
+        distance=qmodels.Distance.COSINE,
+        on_disk=settings.QDRANT_ON_DISK if on_disk is None else on_disk,
+    )
+
+
+def hnsw_config() -> qmodels.HnswConfigDiff:
+    if per_tenant():
+        return qmodels.HnswConfigDiff(m=0, payload_m=settings.QDRANT_HNSW_M, ef_construct=settings.QDRANT_HNSW_EF_CONSTRUCT)
+    return qmodels.HnswConfigDiff(m=settings.QDRANT_HNSW_M, ef_construct=settings.QDRANT_HNSW_EF_CONSTRUCT)
+
+
+def payload_schema(field_name: str):
+    if field_name == "business_id" and per_tenant():
+        return qmodels.KeywordIndexParams(type=qmodels.KeywordIndexType.KEYWORD, is_tenant=True)
+    return "keyword"
+
+
+def search_params(mode: str = None) -> Optional[qmodels.SearchParams]:
+    """Per-query parameters: beam width, and oversampling + rescoring when vectors are quantized."""
+    quantization = None
+    if quantization_config(mode) is not None:
+        quantization = qmodels.QuantizationSearchParams(
+            rescore=settings.QDRANT_RESCORE,
+            oversampling=settings.QDRANT_OVERSAMPLING,
+        )
+    if quantization is None and not settings.QDRANT_SEARCH_EF:
+        return None
+    return qmodels.SearchParams(hnsw_ef=settings.QDRANT_SEARCH_EF or None, quantization=quantization)
+
+
+def ensure_payload_indexes(client, collection_name: str = COLLECTION_NAME):
+    for field_name in PAYLOAD_INDEX_FIELDS:
+        try:
+            client.create_payload_index(
+                collection_name=collection_name, field_name=field_name, field_schema=payload_schema(field_name)
+            )
+        except Exception as e:
+            if "already exists" not in str(e):
+                print(f"⚠️ Payload index warning ({field_name}): {e}")
+
+
+def create_collection(client, collection_name: str = COLLECTION_NAME):
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=vectors_config(),
+        hnsw_config=hnsw_config(),
+        quantization_config=quantization_config(),
+    )
+    ensure_payload_indexes(client, collection_name)
+    print(
+        f"✅ Created Qdrant collection '{collection_name}' "
+        f"(quantization={settings.QDRANT_QUANTIZATION}, on_disk={settings.QDRANT_ON_DISK}, "
+        f"m={settings.QDRANT_HNSW_M}, ef_construct={settings.QDRANT_HNSW_EF_CONSTRUCT}, "
+        f"layout={settings.QDRANT_TENANT_LAYOUT})"
+    )
+
+
+def apply_collection_config(client, collection_name: str = COLLECTION_NAME):
+    """Switch an existing collection to the configured storage settings (same tenant layout only)."""
+    wanted = "per_tenant" if per_tenant() else "global"
+    current = collection_layout(client, collection_name)
+    if current != wanted:
+        # m=0 in place would leave a global collection without any graph for unfiltered searches
+        raise RuntimeError(
+            f"'{collection_name}' uses the {current} layout but QDRANT_TENANT_LAYOUT={wanted}; "
+            f"run `python -m knowledge.collection migrate` to re-lay out the points"
+        )
+    client.update_collection(
+        collection_name=collection_name,
+        vectors_config={"": qmodels.VectorParamsDiff(on_disk=settings.QDRANT_ON_DISK)},
+        hnsw_config=hnsw_config(),
+        quantization_config=quantization_config() or qmodels.Disabled.DISABLED,
+    )
+    ensure_payload_indexes(client, collection_name)
+    print(f"✅ Updated '{collection_name}' (quantization={settings.QDRANT_QUANTIZATION}, on_disk={settings.QDRANT_ON_DISK})")
+
+
+def alias_target(client, alias: str) -> Optional[str]:
+    """The collection `alias` points to, or None when it is not an alias."""
+    for a in client.get_aliases().aliases:
+        if a.alias_name == alias:
+            return a.collection_name
+    return None
+
+
+def migrate_collection(client, alias: str = COLLECTION_NAME, batch_size: int = 256) -> str:
+    """
+    Copy every point into a new collection with the configured layout, then
+    serve `alias` from it. Run it with training paused: points written to the
+    old collection after they were copied are not carried over (re-training
+    the business restores them).
+    """
+    source = alias_target(client, alias) or alias
+    target = f"{alias}_{time.strftime('%Y%m%d%H%M%S')}"
+    create_collection(client, target)
+
+    copied, offset = 0, None
+    while True:
+        points, offset = client.scroll(
+            collection_name=source, limit=batch_size, offset=offset, with_payload=True, with_vectors=True
+        )
+        if points:
+            client.upsert(
+                collection_name=target,
+                points=[qmodels.PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in points],
+                wait=True,
+            )
+            copied += len(points)
+            print(f"📦 Copied {copied} points from '{source}' to '{target}'")
+        if offset is None:
+            break
+
+    expected = client.count(collection_name=source, exact=True).count
+    if client.count(collection_name=target, exact=True).count != expected:
+        raise RuntimeError(f"'{target}' holds a different number of points than '{source}' ({expected}); alias not switched")
+
+    if source == alias:
+        # First migration: the name belongs to a real collection, which has to go before
+        # the alias can take it. Qdrant cannot do both in one call, so there is a short
+        # window in which a starting API process may create an empty one under that name.
+        client.delete_collection(alias)
+
+    def recreated() -> bool:
+        return source == alias and alias_target(client, alias) is None and client.collection_exists(alias)
+
+    try:
+        if recreated():
+            raise RuntimeError("collection exists")
+        switch_alias(client, target, alias)
+    except Exception as e:
+        if recreated():
+            raise RuntimeError(
+                f"'{alias}' was recreated while the alias was being switched (an API process starting?). "
+                f"The migrated points are in '{target}': stop the API, delete the new '{alias}' collection "
+                f"and run `python -m knowledge.collection alias {target}`"
+            ) from e
+        raise
+    print(f"✅ '{alias}' now serves '{target}' ({copied} points)")
+    if source != alias:
+        print(f"ℹ️ Previous collection '{source}' kept; delete it once the new layout is verified")
+    return target
+
+
+def switch_alias(client, target: str, alias: str = COLLECTION_NAME):
+    """Point `alias` at `target` in one atomic alias update."""
+    operations = []
+    if alias_target(client, alias) is not None:
+        operations.append(qmodels.DeleteAliasOperation(delete_alias=qmodels.DeleteAlias(alias_name=alias)))
+    operations.append(
+        qmodels.CreateAliasOperation(create_alias=qmodels.CreateAlias(collection_name=target, alias_name=alias))
+    )
+    client.update_collection_aliases(change_aliases_operations=operations)
+
+
+if __name__ == "__main__":
+    from qdrant_client import QdrantClient
+
+    parser = argparse.ArgumentParser(description="Apply storage settings to chatflow_vectors")
+    parser.add_argument("command", nargs="?", choices=("apply", "migrate", "alias"), default="apply",
+                        help="apply: update settings in place; migrate: re-lay out points into a new collection; "
+                             "alias: point chatflow_vectors at TARGET")
+    parser.add_argument("target", nargs="?", help="collection for the alias command")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    client = QdrantClient(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY, timeout=300)
+    if args.command == "migrate":
+        migrate_collection(client, batch_size=args.batch_size)
+    elif args.command == "alias":
+        if not args.target:
+            parser.error("alias needs the target collection")
+        switch_alias(client, args.target)
+        print(f"✅ '{COLLECTION_NAME}' now serves '{args.target}'")
+    else:
+        apply_collection_config(client)
@@ -0,0 +1,120 @@
+# knowledge/context.py
+# ----------------------------------------------------
+# Context assembly: retrieved chunks -> token-budgeted prompt context
+# ----------------------------------------------------
+#
+#   1. Chunks of the same source with consecutive chunk_index are stitched
+#      into one passage, with the splitter's overlap written out once.
+#   2. Passages whose word shingles are mostly covered by a more relevant
+#      passage (the same paragraph uploaded twice, a Q/A repeating a
+#      document) are dropped.
+#   3. Passages are packed by relevance until CONTEXT_TOKEN_BUDGET is spent;
+#      a passage larger than what is left is cut to fit.
+
+from typing import List, Tuple
+
+from langchain_core.documents import Document
+
+from core.config import settings
+from knowledge.chunking import CHUNK_OVERLAP
+from knowledge.embedding import count_tokens, truncate_tokens
+
+# Overlaps shorter than this are treated as coincidence, not splitter overlap
+_MIN_OVERLAP = 16
+_SHINGLE_WORDS = 5
+# A passage cut to fewer tokens than this is not worth its place in the prompt
+_MIN_CUT_TOKENS = 32
+
+
+def _overlap(left: str, right: str, max_overlap: int = 2 * CHUNK_OVERLAP) -> int:
+    """Length of the longest suffix of `left` that is a prefix of `right`."""
+    tail = left[-max_overlap:]
+    probe = right[:_MIN_OVERLAP]
+    if len(probe) < _MIN_OVERLAP:
+        return 0
+    pos = tail.find(probe)
+    while pos != -1:
+        # Earliest position = longest overlap
+        if right.startswith(tail[pos:]):
+            return len(tail) - pos
+        pos = tail.find(probe, pos + 1)
+    return 0
+
+
+def _stitch(left: str, right: str) -> str:
+    k = _overlap(left, right)
+    return left + right[k:] if k else f"{left}\n{right}"
+
+
+def merge_adjacent(docs: List[Document]) -> List[Document]:
+    """Stitch chunks that are neighbours in the same source; passages keep the best score."""
+    groups = {}  # source -> [doc, ...]
+    passages = []
+    for d in docs:
+        source = d.metadata.get("source")
+        if source is None or d.metadata.get("chunk_index") is None:
+            passages.append(d)  # points from before source metadata: nothing to stitch
+        else:
+            groups.setdefault(source, []).append(d)
+
+    for chunks in groups.values():
+        chunks.sort(key=lambda d: d.metadata["chunk_index"])
+        run = [chunks[0]]
+        for d in chunks[1:] + [None]:
+            if d is not None and d.metadata["chunk_index"] == run[-1].metadata["chunk_index"] + 1:
+                run.append(d)
+                continue
+            text = run[0].page_content
+            for nxt in run[1:]:
+                text = _stitch(text, nxt.page_content)
+            meta = dict(run[0].metadata)
+            meta["score"] = max(c.metadata.get("score") or 0.0 for c in run)
+            meta["chunk_indexes"] = [c.metadata["chunk_index"] for c in run]
+            passages.append(Document(page_content=text, metadata=meta))
+            run = [d]
+    return passages
+
+
+def _shingles(text: str) -> set:
+    words = text.lower().split()
+    if len(words) <= _SHINGLE_WORDS:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + _SHINGLE_WORDS]) for i in range(len(words) - _SHINGLE_WORDS + 1)}
+
+
+def pack_context(docs: List[Document], token_budget: int = None, dedup_threshold: float = None) -> Tuple[List[Document], dict]:
+    """
+    Merge, deduplicate and budget retrieved chunks. Returns the passages for
+    the prompt (most relevant first) and token counts before/after.
+    """
+    token_budget = token_budget or settings.CONTEXT_TOKEN_BUDGET
+    dedup_threshold = dedup_threshold if dedup_threshold is not None else settings.CONTEXT_DEDUP_THRESHOLD
+    tokens_in = sum(count_tokens(d.page_content) for d in docs)
+
+    passages = sorted(merge_adjacent(docs), key=lambda d: d.metadata.get("score") or 0.0, reverse=True)
+    packed, seen, used, duplicates = [], [], 0, 0
+    for p in passages:
+        shingles = _shingles(p.page_content)
+        if any(len(shingles & s) >= dedup_threshold * len(shingles) for s in seen):
+            duplicates += 1
+            continue
+        n = count_tokens(p.page_content)
+        if used + n > token_budget:
+            # Merged runs can outgrow what is left: keep their leading part
+            # rather than dropping every chunk they hold
+            remaining = token_budget - used
+            if packed and remaining < _MIN_CUT_TOKENS:
+                continue  # a smaller, less relevant passage may still fit
+            p = Document(page_content=truncate_tokens(p.page_content, remaining), metadata=p.metadata)
+            n = count_tokens(p.page_content)
+        packed.append(p)
+        seen.append(shingles)
+        used += n
+
+    return packed, {
+        "chunks": len(docs),
+        "passages": len(packed),
+        "duplicates": duplicates,
+        "tokens_in": tokens_in,
+        "tokens_out": used,
+    }
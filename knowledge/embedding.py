@@ -0,0 +1,128 @@
+# knowledge/embedding.py
+# ----------------------------------------------------
+# Batched, concurrent embedding for training
+# ----------------------------------------------------
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from core.config import settings
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tokenizer files unavailable (offline) -> estimate instead
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """cl100k_base token count (ada-002 and gpt-3.5-turbo), used for batches and prompt budgets."""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    # ~4 chars per token for English; round up so batches stay under the limit
+    return len(text) // 3 + 1
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Leading part of `text` that fits in `max_tokens` tokens."""
+    if _encoding is not None:
+        tokens = _encoding.encode(text, disallowed_special=())
+        return text if len(tokens) <= max_tokens else _encoding.decode(tokens[:max_tokens])
+    return text[: max(0, max_tokens - 1) * 3]
+
+
+# ----------------------------------------------------
+# 1. Batching
+# ----------------------------------------------------
+def iter_batches(
+    chunks: Iterable[str],
+    max_batch_size: Optional[int] = None,
+    max_batch_tokens: Optional[int] = None,
+) -> Iterator[List[str]]:
+    """
+    Group a stream of chunks into lists that respect both the per-request
+    item limit and the per-request token limit, preserving order.
+    """
+    max_batch_size = max_batch_size or settings.EMBED_BATCH_SIZE
+    max_batch_tokens = max_batch_tokens or settings.EMBED_BATCH_TOKENS
+
+    batch, tokens = [], 0
+    for chunk in chunks:
+        n = count_tokens(chunk)
+        if batch and (len(batch) >= max_batch_size or tokens + n > max_batch_tokens):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(chunk)
+        tokens += n
+    if batch:
+        yield batch
+
+
+# ----------------------------------------------------
+# 2. Embedding with per-batch retries
+# ----------------------------------------------------
+def _embed_batch(embedder, texts: List[str], max_retries: int) -> List[List[float]]:
+    attempt = 0
+    while True:
+        try:
+            vectors = embedder.embed_documents(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"expected {len(texts)} vectors, got {len(vectors)}")
+            return vectors
+        except Exception as e:
+            attempt += 1
+            if attempt > max_retries:
+                raise
+            delay = min(2 ** attempt, 30)
+            print(f"⚠️ Embedding batch of {len(texts)} failed ({e}); retry {attempt}/{max_retries} in {delay}s")
+            time.sleep(delay)
+
+
+def iter_embeddings(
+    embedder,
+    chunks: Iterable[str],
+    batch_size: Optional[int] = None,
+    batch_tokens: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> Iterator[List[float]]:
+    """
+    Embed chunks in size/token-bounded batches, running up to `concurrency`
+    batches at once, and yield vectors in the same order as `chunks`.
+    Only a failing batch is retried. `chunks` may be a lazy iterator: batches
+    are pulled and submitted only as the consumer catches up, so a slow
+    consumer throttles embedding instead of letting vectors pile up.
+    `on_progress` receives the number of chunks embedded so far after each batch.
+    """
+    concurrency = concurrency or settings.EMBED_CONCURRENCY
+    max_retries = settings.EMBED_MAX_RETRIES if max_retries is None else max_retries
+    batches = iter_batches(chunks, batch_size, batch_tokens)
+
+    done = 0
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            while True:
+                while len(pending) < concurrency:
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    pending.append(pool.submit(_embed_batch, embedder, batch, max_retries))
+                if not pending:
+                    return
+                batch_vectors = pending.popleft().result()
+                done += len(batch_vectors)
+                if on_progress:
+                    on_progress(done)
+                yield from batch_vectors
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def embed_chunks(embedder, chunks: Iterable[str], **kwargs) -> List[List[float]]:
+    """List form of `iter_embeddings`."""
+    return list(iter_embeddings(embedder, chunks, **kwargs))
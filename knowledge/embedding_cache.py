@@ -0,0 +1,215 @@
+# knowledge/embedding_cache.py
+# ----------------------------------------------------
+# Persistent embedding cache (SQLite + in-memory LRU)
+# ----------------------------------------------------
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class EmbeddingCache:
+    """
+    Vectors keyed by sha256(model, text), stored as float32 blobs in SQLite.
+    A bounded in-memory LRU of float32 arrays (6 KB per 1536-dim vector, a
+    Python list of floats would take ~8x that) sits in front of the disk
+    store, and the disk store evicts least-recently-used rows once it grows
+    past `max_bytes`. Callers still get plain lists.
+    """
+
+    def __init__(self, path: str, max_bytes: int, memory_items: int = 10000):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self._lru: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, vector BLOB NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x1f{text}".encode("utf-8")).hexdigest()
+
+    # ------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for k in keys:
+                if k in self._lru:
+                    self._lru.move_to_end(k)
+                    found[k] = self._lru[k].tolist()
+            in_memory = set(found)
+
+            missing = [k for k in dict.fromkeys(keys) if k not in found]
+            for i in range(0, len(missing), 500):
+                part = missing[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for k, blob in rows:
+                    vec = np.frombuffer(blob, dtype=np.float32)
+                    found[k] = vec.tolist()
+                    self._remember(k, vec)
+                if rows:
+                    now = time.time()
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k, _ in rows]
+                    )
+            self._conn.commit()
+            for k in keys:
+                if k in in_memory:
+                    self.memory_hits += 1
+                elif k in found:
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]):
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        with self._lock:
+            for k, vec in items.items():
+                arr = np.asarray(vec, dtype=np.float32)
+                blob = arr.tobytes()
+                rows.append((k, blob, len(blob), now))
+                self._remember(k, arr)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, size, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+            self._disk_bytes += sum(r[2] for r in rows)
+            if self._disk_bytes > self.max_bytes:
+                self._evict()
+
+    def _remember(self, key: str, vec: np.ndarray):
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_items:
+            self._lru.popitem(last=False)
+
+    def _evict(self):
+        # Other worker processes write to the same file, so re-read the real size first
+        self._disk_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        target = int(self.max_bytes * 0.9)
+        while self._disk_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_used LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                break
+            drop, freed = [], 0
+            for k, size in rows:
+                if self._disk_bytes - freed <= target:
+                    break
+                drop.append((k,))
+                freed += size
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", drop)
+            self._conn.commit()
+            self._disk_bytes -= freed
+            self.evictions += len(drop)
+
+    # ------------------------------------------------
+    # Metrics
+    # ------------------------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "lookups": lookups,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "memory_items": len(self._lru),
+                "disk_bytes": self._disk_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses to the underlying model."""
+
+    def __init__(self, underlying: Embeddings, cache: EmbeddingCache, model_name: str):
+        self.underlying = underlying
+        self.cache = cache
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [EmbeddingCache.make_key(self.model_name, t) for t in texts]
+        found = self.cache.get_many(keys)
+
+        todo = {}  # key -> text, deduplicated
+        for k, t in zip(keys, texts):
+            if k not in found:
+                todo.setdefault(k, t)
+        if todo:
+            vectors = self.underlying.embed_documents(list(todo.values()))
+            fresh = dict(zip(todo.keys(), vectors))
+            self.cache.put_many(fresh)
+            found.update(fresh)
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = EmbeddingCache.make_key(self.model_name, text)
+        found = self.cache.get_many([key])
+        if key in found:
+            return found[key]
+        vector = self.underlying.embed_query(text)
+        self.cache.put_many({key: vector})
+        return vector
+
+    # Async variants: cache reads/writes hit SQLite under a lock (and may evict),
+    # so they run on a thread instead of blocking the event loop
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [EmbeddingCache.make_key(self.model_name, t) for t in texts]
+        found = await asyncio.to_thread(self.cache.get_many, keys)
+
+        todo = {}
+        for k, t in zip(keys, texts):
+            if k not in found:
+                todo.setdefault(k, t)
+        if todo:
+            vectors = await self.underlying.aembed_documents(list(todo.values()))
+            fresh = dict(zip(todo.keys(), vectors))
+            await asyncio.to_thread(self.cache.put_many, fresh)
+            found.update(fresh)
+        return [found[k] for k in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = EmbeddingCache.make_key(self.model_name, text)
+        found = await asyncio.to_thread(self.cache.get_many, [key])
+        if key in found:
+            return found[key]
+        vector = await self.underlying.aembed_query(text)
+        await asyncio.to_thread(self.cache.put_many, {key: vector})
+        return vector
+
+    def stats(self) -> dict:
+        return {"model": self.model_name, **self.cache.stats()}
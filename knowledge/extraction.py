@@ -0,0 +1,111 @@
+# knowledge/extraction.py
+# ----------------------------------------------------
+# Streaming text extraction (PDF / DOCX)
+# ----------------------------------------------------
+
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, List
+
+import fitz
+import docx2txt
+
+from core.config import settings
+
+SPOOL_CHUNK_BYTES = 1024 * 1024
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def spool_to_disk(src: BinaryIO, dst: BinaryIO, chunk_bytes: int = SPOOL_CHUNK_BYTES, hasher=None) -> int:
+    """
+    Copy an upload stream to disk in fixed-size chunks; returns bytes written.
+    If a hashlib object is passed it is updated with every block.
+    """
+    written = 0
+    while True:
+        block = src.read(chunk_bytes)
+        if not block:
+            return written
+        dst.write(block)
+        if hasher is not None:
+            hasher.update(block)
+        written += len(block)
+
+
+# ----------------------------------------------------
+# Process pool
+# ----------------------------------------------------
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the API process runs threads (uvicorn, qdrant/grpc) that must not be forked
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _extract_page_range(file_path: str, start: int, end: int) -> List[str]:
+    with fitz.open(file_path) as pdf:
+        return [pdf[i].get_text() for i in range(start, end)]
+
+
+def _iter_pdf_pages_parallel(file_path: str, page_count: int) -> Iterator[str]:
+    """
+    Extract page ranges in the process pool and yield pages in document order.
+    Only a bounded number of ranges is in flight, so memory stays flat.
+    """
+    step = max(1, settings.EXTRACT_PAGES_PER_TASK)
+    ranges = deque((s, min(s + step, page_count)) for s in range(0, page_count, step))
+    pending = deque()
+    max_ahead = settings.EXTRACT_WORKERS * 2
+    pool = _get_pool()
+    try:
+        while ranges or pending:
+            while ranges and len(pending) < max_ahead:
+                start, end = ranges.popleft()
+                pending.append(pool.submit(_extract_page_range, file_path, start, end))
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+# ----------------------------------------------------
+# Extraction
+# ----------------------------------------------------
+def iter_pages(file_path: str) -> Iterator[str]:
+    """
+    Yield the text of a document one page at a time (DOCX is a single page).
+    PDFs with at least EXTRACT_PARALLEL_MIN_PAGES pages are split into page
+    ranges and parsed across EXTRACT_WORKERS processes. A DOCX is parsed in
+    one task, which only goes to the pool (off the API process's GIL) from
+    EXTRACT_PARALLEL_MIN_DOCX_MB up; below that the IPC costs more than it saves.
+    """
+    parallel = settings.EXTRACT_WORKERS > 1
+    if file_path.endswith(".pdf"):
+        with fitz.open(file_path) as pdf:
+            if not parallel or pdf.page_count < settings.EXTRACT_PARALLEL_MIN_PAGES:
+                for page in pdf:
+                    yield page.get_text()
+                return
+            page_count = pdf.page_count
+        yield from _iter_pdf_pages_parallel(file_path, page_count)
+    elif file_path.endswith(".docx"):
+        if parallel and os.path.getsize(file_path) >= settings.EXTRACT_PARALLEL_MIN_DOCX_MB * 1024 * 1024:
+            yield _get_pool().submit(docx2txt.process, file_path).result()
+        else:
+            yield docx2txt.process(file_path)
+    else:
+        raise ValueError("Unsupported file format. Use PDF or DOCX.")
+
+
+def extract_text(file_path: str) -> str:
+    return "".join(iter_pages(file_path))
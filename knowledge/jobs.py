@@ -0,0 +1,263 @@
+# knowledge/jobs.py
+# ----------------------------------------------------
+# Background training jobs
+# ----------------------------------------------------
+#
+# Jobs are rows in `training_jobs`. Any number of workers (threads inside the
+# API process and/or `python -m knowledge.worker` processes) claim queued jobs
+# from the table. A business never has two jobs running at once: claiming is
+# serialised per business (Postgres advisory lock) and skips businesses that
+# already have a running job. While a job runs, a heartbeat thread touches
+# its `updated_at` every TRAIN_HEARTBEAT_SECONDS; a running job that has not
+# been touched for TRAIN_JOB_STALE_SECONDS lost its worker and is re-queued.
+
+import threading
+import traceback
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.db import SessionLocal
+from knowledge import versions
+from knowledge.models import TrainingJob
+
+_claim_lock = threading.Lock()
+
+
+# ----------------------------------------------------
+# 1. Queue
+# ----------------------------------------------------
+def enqueue_training(db: Session, business_id: str) -> TrainingJob:
+    """Queue a training run; a business with a job already waiting reuses it."""
+    job = (
+        db.query(TrainingJob)
+        .filter(TrainingJob.business_id == business_id, TrainingJob.status == "queued")
+        .first()
+    )
+    if job:
+        return job
+
+    job = TrainingJob(business_id=business_id, status="queued")
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    if _pool is not None:
+        _pool.wake()
+    return job
+
+
+def get_job(db: Session, job_id: str) -> Optional[TrainingJob]:
+    return db.query(TrainingJob).filter(TrainingJob.id == job_id).first()
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _requeue_stale_jobs(db: Session):
+    """Jobs whose worker stopped heart-beating go back to the queue (training is idempotent)."""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.TRAIN_JOB_STALE_SECONDS)
+    stale = (
+        db.query(TrainingJob)
+        .filter(TrainingJob.status == "running", TrainingJob.updated_at < cutoff)
+        .all()
+    )
+    for job in stale:
+        print(f"⚠️ Training job {job.id} lost its worker; re-queueing")
+        job.status = "queued"
+    if stale:
+        db.commit()
+
+
+def claim_next_job(db: Session) -> Optional[TrainingJob]:
+    """Mark the oldest runnable queued job as running and return it."""
+    with _claim_lock:
+        _requeue_stale_jobs(db)
+        postgres = _is_postgres(db)
+
+        busy = db.query(TrainingJob.business_id).filter(TrainingJob.status == "running")
+        query = (
+            db.query(TrainingJob)
+            .filter(TrainingJob.status == "queued", ~TrainingJob.business_id.in_(busy))
+            .order_by(TrainingJob.created_at)
+        )
+        if postgres:
+            query = query.with_for_update(skip_locked=True)
+        job = query.first()
+        if not job:
+            db.rollback()
+            return None
+
+        if postgres:
+            # Serialise claims for this business across worker processes, then re-check
+            db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": str(job.business_id)})
+            already_running = (
+                db.query(TrainingJob.id)
+                .filter(TrainingJob.business_id == job.business_id, TrainingJob.status == "running")
+                .first()
+            )
+            if already_running:
+                db.rollback()
+                return None
+
+        now = datetime.utcnow()
+        job.status = "running"
+        job.started_at = now
+        job.updated_at = now
+        db.commit()
+        db.refresh(job)
+        return job
+
+
+# ----------------------------------------------------
+# 2. Job step
+# ----------------------------------------------------
+class _Heartbeat:
+    """Touches a running job's updated_at on a timer, independent of training progress."""
+
+    def __init__(self, job_id, interval: float):
+        self.job_id = job_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"training-heartbeat-{job_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            db = SessionLocal()
+            try:
+                db.query(TrainingJob).filter(
+                    TrainingJob.id == self.job_id, TrainingJob.status == "running"
+                ).update({TrainingJob.updated_at: datetime.utcnow()}, synchronize_session=False)
+                db.commit()
+            except Exception as e:
+                print(f"⚠️ Training job {self.job_id} heartbeat failed: {e}")
+            finally:
+                db.close()
+
+
+def run_job(job_id):
+    """Run one claimed job: the training step plus progress/status bookkeeping."""
+    from knowledge import service
+
+    db = SessionLocal()
+    progress_db = SessionLocal()
+    heartbeat = _Heartbeat(job_id, settings.TRAIN_HEARTBEAT_SECONDS).start()
+    try:
+        job = db.query(TrainingJob).filter(TrainingJob.id == job_id).first()
+        business_id = job.business_id
+
+        def progress(total=None, embedded=None, upserted=None):
+            row = progress_db.query(TrainingJob).filter(TrainingJob.id == job_id).first()
+            if total is not None:
+                row.chunks_total = total
+            if embedded is not None:
+                row.chunks_embedded = embedded
+            if upserted is not None:
+                row.chunks_upserted = upserted
+            row.updated_at = datetime.utcnow()
+            progress_db.commit()
+
+        try:
+            result = service.train_business_knowledge(db, business_id, progress=progress)
+            status, message, error = "completed", result.get("message"), None
+        except Exception as e:
+            traceback.print_exc()
+            db.rollback()
+            status, message, error = "failed", None, str(e)
+            # Part of the run may already be in Qdrant
+            versions.bump_version(db, business_id, versions.VECTORS)
+
+        job = db.query(TrainingJob).filter(TrainingJob.id == job_id).first()
+        job.status = status
+        job.message = message
+        job.error = error
+        job.finished_at = datetime.utcnow()
+        job.updated_at = job.finished_at
+        db.commit()
+        print(f"{'✅' if status == 'completed' else '❌'} Training job {job_id} {status}")
+    finally:
+        heartbeat.stop()
+        progress_db.close()
+        db.close()
+
+
+def run_next_job() -> bool:
+    """Claim and run one job; returns False when nothing was runnable."""
+    db = SessionLocal()
+    try:
+        job = claim_next_job(db)
+        job_id = job.id if job else None
+    finally:
+        db.close()
+    if job_id is None:
+        return False
+    run_job(job_id)
+    return True
+
+
+# ----------------------------------------------------
+# 3. Worker pool
+# ----------------------------------------------------
+class TrainingWorkerPool:
+    """Threads that poll the job table; `wake()` skips the poll delay after an enqueue."""
+
+    def __init__(self, workers: int, poll_seconds: float):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"training-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if run_next_job():
+                    continue
+            except Exception as e:
+                print(f"⚠️ Training worker error: {e}")
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+
+_pool: Optional[TrainingWorkerPool] = None
+
+
+def start_workers(workers: Optional[int] = None) -> TrainingWorkerPool:
+    global _pool
+    if _pool is None:
+        _pool = TrainingWorkerPool(workers or settings.TRAIN_WORKERS, settings.TRAIN_POLL_SECONDS)
+        _pool.start()
+    return _pool
+
+
+def stop_workers():
+    global _pool
+    if _pool is not None:
+        _pool.stop()
+        _pool = None
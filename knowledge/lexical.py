@@ -0,0 +1,203 @@
+# knowledge/lexical.py
+# ----------------------------------------------------
+# Per-business BM25 index + reciprocal rank fusion
+# ----------------------------------------------------
+#
+# Dense retrieval is weak on exact tokens (SKUs, prices, names). Training
+# builds a BM25 inverted index over the same chunks it embeds and stores it
+# as zstd-compressed JSON:
+#
+#   <LEXICAL_INDEX_DIR>/<business_id>.json.zst
+#       {"ids": [point id, ...], "lengths": [...], "terms": {term: [[row, ...], [tf, ...]]}}
+#
+# Only point ids are kept; chunk text stays in Qdrant. At query time the
+# BM25 ranking is fused with the vector ranking by reciprocal rank fusion.
+
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import zstandard as zstd
+
+from core.config import settings
+
+# Words, plus codes and numbers that keep their inner . - / (SKU-1234, 19.99, 2024/25)
+_TOKEN_RE = re.compile(r"\w+(?:[.\-/]\w+)*")
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if not token.isalnum():
+            # "sku-1234" should also match a query for "1234"
+            tokens.extend(t for t in re.split(r"[.\-/]", token) if t)
+    return tokens
+
+
+def identifier_tokens(text: str) -> frozenset:
+    """Tokens with a digit or inner . - / (SKU-1234, 19.99, v2): the ones embeddings barely tell apart."""
+    return frozenset(t for t in tokenize(text) if not t.isalpha())
+
+
+class BM25Builder:
+    """Accumulates term counts chunk by chunk, so training never holds the text."""
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.lengths: List[int] = []
+        self.terms: Dict[str, Tuple[List[int], List[int]]] = {}
+        self._seen = set()
+
+    def add(self, point_id: str, text: str):
+        if point_id in self._seen:
+            return
+        self._seen.add(point_id)
+        row = len(self.ids)
+        tokens = tokenize(text)
+        self.ids.append(str(point_id))
+        self.lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            rows, tfs = self.terms.setdefault(term, ([], []))
+            rows.append(row)
+            tfs.append(tf)
+
+    def to_json(self) -> bytes:
+        return json.dumps(
+            {"ids": self.ids, "lengths": self.lengths, "terms": self.terms}, separators=(",", ":")
+        ).encode("utf-8")
+
+
+class BM25Index:
+    def __init__(self, data: dict, stamp: tuple = None):
+        self.stamp = stamp
+        self.ids: List[str] = data["ids"]
+        self._terms = data["terms"]
+        self._lengths = np.asarray(data["lengths"], dtype=np.float32)
+        self._avgdl = float(self._lengths.mean()) if len(self.ids) else 0.0
+        self._postings = {}  # term -> (rows, tfs) as arrays, converted on first use
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _posting(self, term: str):
+        posting = self._postings.get(term)
+        if posting is None:
+            rows, tfs = self._terms.get(term, ([], []))
+            posting = self._postings[term] = (np.asarray(rows, dtype=np.int64), np.asarray(tfs, dtype=np.float32))
+        return posting
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top-k (point id, BM25 score)."""
+        n = len(self.ids)
+        if not n:
+            return []
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(tokenize(query)):
+            rows, tfs = self._posting(term)
+            if not len(rows):
+                continue
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[rows] / self._avgdl)
+            scores[rows] += idf * tfs * (BM25_K1 + 1) / (tfs + norm)
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [(self.ids[i], float(scores[i])) for i in hits]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank)."""
+    fused = {}
+    for ranking in rankings:
+        for rank, pid in enumerate(ranking, start=1):
+            fused[pid] = fused.get(pid, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class LexicalIndexStore:
+    def __init__(self, root: str, max_open: int, level: int = 10):
+        self.root = os.path.abspath(root)
+        self.max_open = max_open
+        self.level = level
+        self._open: "OrderedDict[str, BM25Index]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, business_id) -> str:
+        return os.path.join(self.root, f"{uuid.UUID(str(business_id))}.json.zst")
+
+    def exists(self, business_id) -> bool:
+        return os.path.exists(self._path(business_id))
+
+    def write(self, business_id, builder: BM25Builder):
+        path = self._path(business_id)
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(zstd.ZstdCompressor(level=self.level).compress(builder.to_json()))
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def needs_load(self, business_id) -> bool:
+        """True when get() would read the file (not open yet, or replaced by training)."""
+        try:
+            st = os.stat(self._path(business_id))
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            index = self._open.get(str(business_id))
+        return index is None or index.stamp != (st.st_ino, st.st_mtime_ns)
+
+    def get(self, business_id) -> Optional[BM25Index]:
+        """The business's index, reloaded when training replaced the file."""
+        key = str(business_id)
+        path = self._path(key)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stamp = (st.st_ino, st.st_mtime_ns)
+        with self._lock:
+            index = self._open.get(key)
+            if index is not None and index.stamp == stamp:
+                self._open.move_to_end(key)
+                return index
+
+        with open(path, "rb") as fh:
+            data = json.loads(zstd.ZstdDecompressor().stream_reader(fh).read())
+        index = BM25Index(data, stamp)
+        with self._lock:
+            self._open[key] = index
+            self._open.move_to_end(key)
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return index
+
+    def drop(self, business_id):
+        try:
+            os.remove(self._path(business_id))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._open.pop(str(business_id), None)
+
+
+lexical_indexes = LexicalIndexStore(
+    settings.LEXICAL_INDEX_DIR,
+    max_open=settings.PIPELINE_CACHE_MAX_BUSINESSES,
+    level=settings.BLOB_ZSTD_LEVEL,
+)
@@ -0,0 +1,184 @@
+# knowledge/local_index.py
+# ----------------------------------------------------
+# In-process vector search for small businesses (mmap snapshots)
+# ----------------------------------------------------
+#
+# A business with at most LOCAL_INDEX_MAX_POINTS chunks gets a snapshot of
+# its Qdrant points on local disk:
+#
+#   <LOCAL_INDEX_DIR>/<business_id>/CURRENT            -> snapshot name
+#   <LOCAL_INDEX_DIR>/<business_id>/<snapshot>/vectors.npy   L2-normalised float32
+#   <LOCAL_INDEX_DIR>/<business_id>/<snapshot>/payloads.json
+#
+# Vectors are opened with np.load(mmap_mode="r"), so every worker process
+# on the host shares the same pages through the OS page cache. A new
+# snapshot is written next to the old one and published by replacing
+# CURRENT; readers notice the new inode with one stat() per query.
+# Qdrant stays the source of truth and serves everyone above the threshold.
+
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+from typing import List, Optional
+
+import numpy as np
+
+from core.config import settings
+
+LocalHit = namedtuple("LocalHit", "id score payload")
+
+
+class LocalIndex:
+    """One loaded snapshot: a (possibly memory-mapped) matrix and its payloads."""
+
+    def __init__(self, path: str, stamp: tuple):
+        self.stamp = stamp  # (inode, mtime) of the CURRENT file it was opened from
+        with open(os.path.join(path, "payloads.json"), encoding="utf-8") as fh:
+            meta = json.load(fh)
+        self.ids = meta["ids"]
+        self.payloads = meta["payloads"]
+        # A zero-length array cannot be memory-mapped
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if self.ids else None)
+        self._row_of = None
+
+    def payload(self, point_id: str) -> Optional[dict]:
+        if self._row_of is None:
+            self._row_of = {pid: i for i, pid in enumerate(self.ids)}
+        row = self._row_of.get(str(point_id))
+        return self.payloads[row] if row is not None else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query_vector, k: int) -> List[LocalHit]:
+        if not self.ids:
+            return []
+        q = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        scores = self.vectors @ (q / norm if norm else q)
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+        else:
+            top = np.argsort(-scores)
+        return [LocalHit(self.ids[i], float(scores[i]), self.payloads[i]) for i in top]
+
+
+class LocalIndexStore:
+    def __init__(self, root: str, max_points: int, max_open: int):
+        self.root = os.path.abspath(root)
+        self.max_points = max_points
+        self.max_open = max_open
+        self._open: "OrderedDict[str, LocalIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _dir(self, business_id) -> str:
+        return os.path.join(self.root, str(uuid.UUID(str(business_id))))
+
+    # ------------------------------------------------
+    # Readers
+    # ------------------------------------------------
+    def needs_load(self, business_id) -> bool:
+        """True when get() would open a snapshot (not open yet, or replaced by training)."""
+        try:
+            st = os.stat(os.path.join(self._dir(business_id), "CURRENT"))
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            index = self._open.get(str(business_id))
+        return index is None or index.stamp != (st.st_ino, st.st_mtime_ns)
+
+    def get(self, business_id) -> Optional[LocalIndex]:
+        """The business's current snapshot, or None if it is served by Qdrant."""
+        key = str(business_id)
+        current = os.path.join(self._dir(key), "CURRENT")
+        try:
+            st = os.stat(current)
+        except FileNotFoundError:
+            with self._lock:
+                self._open.pop(key, None)
+            return None
+
+        with self._lock:
+            index = self._open.get(key)
+            if index is not None and index.stamp == (st.st_ino, st.st_mtime_ns):
+                self._open.move_to_end(key)
+                return index
+
+        try:
+            with open(current, encoding="utf-8") as fh:
+                snapshot = fh.read().strip()
+            index = LocalIndex(os.path.join(self._dir(key), snapshot), (st.st_ino, st.st_mtime_ns))
+        except (FileNotFoundError, ValueError) as e:
+            # Raced with a writer replacing the snapshot; Qdrant answers this one
+            print(f"⚠️ Local index for {key} unavailable: {e}")
+            return None
+        with self._lock:
+            self._open[key] = index
+            self._open.move_to_end(key)
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        return index
+
+    def exists(self, business_id) -> bool:
+        return os.path.exists(os.path.join(self._dir(business_id), "CURRENT"))
+
+    # ------------------------------------------------
+    # Writers (training / deletes)
+    # ------------------------------------------------
+    def write(self, business_id, ids: List[str], vectors, payloads: List[dict]):
+        """Publish a new snapshot and remove the ones it replaces."""
+        base = self._dir(business_id)
+        snapshot = f"{time.time_ns():x}"
+        path = os.path.join(base, snapshot)
+        os.makedirs(path, exist_ok=True)
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(ids), -1) if len(ids) else np.empty((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        np.save(os.path.join(path, "vectors.npy"), matrix / norms)
+        with open(os.path.join(path, "payloads.json"), "w", encoding="utf-8") as fh:
+            json.dump({"ids": [str(i) for i in ids], "payloads": payloads}, fh, ensure_ascii=False)
+
+        tmp = os.path.join(base, f"CURRENT.{snapshot}")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(snapshot)
+        os.replace(tmp, os.path.join(base, "CURRENT"))
+
+        # Open maps of older snapshots stay valid after unlink on POSIX
+        for name in os.listdir(base):
+            if name != snapshot and not name.startswith("CURRENT"):
+                shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+
+    def remove_matching(self, business_id, field: str, value: str):
+        """Drop the points whose payload `field` equals `value` (a deleted document or Q/A)."""
+        index = self.get(business_id)
+        if index is None:
+            return
+        keep = [i for i, p in enumerate(index.payloads) if str(p.get(field)) != str(value)]
+        if len(keep) == len(index):
+            return
+        self.write(
+            business_id,
+            [index.ids[i] for i in keep],
+            np.asarray(index.vectors)[keep] if keep else np.empty((0, index.vectors.shape[1]), dtype=np.float32),
+            [index.payloads[i] for i in keep],
+        )
+
+    def drop(self, business_id):
+        shutil.rmtree(self._dir(business_id), ignore_errors=True)
+        with self._lock:
+            self._open.pop(str(business_id), None)
+
+
+local_indexes = LocalIndexStore(
+    settings.LOCAL_INDEX_DIR,
+    max_points=settings.LOCAL_INDEX_MAX_POINTS,
+    max_open=settings.PIPELINE_CACHE_MAX_BUSINESSES,
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Integer
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
 import uuid
@@ -12,6 +12,7 @@ class Knowledge(Base):
     file_name = Column(String)
     file_url = Column(String, nullable=True)
     content = Column(Text)
+    content_hash = Column(String(64), nullable=True, index=True)  # sha256 of the uploaded file
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -22,4 +23,30 @@ class ManualQA(Base):
     business_id = Column(UUID(as_uuid=True), ForeignKey("business.id"), nullable=False)
     question = Column(String, nullable=False)
     answer = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class KnowledgeVersion(Base):
+    """Per-business knowledge version stamps shared by every process (see knowledge/versions.py)."""
+    __tablename__ = "knowledge_versions"
+
+    business_id = Column(UUID(as_uuid=True), ForeignKey("business.id"), primary_key=True)
+    qa_version = Column(Integer, nullable=False, default=0)
+    vectors_version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TrainingJob(Base):
+    __tablename__ = "training_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    business_id = Column(UUID(as_uuid=True), ForeignKey("business.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued", index=True)  # queued | running | completed | failed
+    chunks_total = Column(Integer, nullable=False, default=0)
+    chunks_embedded = Column(Integer, nullable=False, default=0)
+    chunks_upserted = Column(Integer, nullable=False, default=0)
+    message = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)  # heartbeat while running
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,303 @@
+# knowledge/pipeline.py
+# ----------------------------------------------------
+# Long-lived retrieval pipelines, cached per business
+# ----------------------------------------------------
+#
+# The prompt, LLM and stuff-documents chain are shared by every business.
+# Per business only the payload text key and the business filter are kept;
+# they are re-resolved when training (in any process) bumps the business's
+# vectors version or the cache TTL runs out. Callers embed the query once, search once and hand
+# the filtered documents straight to the stuff-documents chain. Businesses
+# with a local snapshot (knowledge/local_index.py) are searched in-process.
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import AsyncIterator, Iterator, List, Optional
+
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.documents import Document
+from langchain_core.prompts import PromptTemplate
+from langchain_openai import ChatOpenAI
+from qdrant_client.http import models as qmodels
+
+from core import metrics
+from core.config import settings
+from knowledge import versions
+from knowledge.collection import COLLECTION_NAME, search_params
+from knowledge.lexical import reciprocal_rank_fusion
+
+# Helper: infer which payload key holds the chunk text
+POSSIBLE_TEXT_KEYS = ("page_content", "text", "content", "chunk", "body", "document", "raw_text")
+RETRIEVAL_K = 8
+
+Hit = namedtuple("Hit", "id score payload")
+
+PROMPT_TEMPLATE = (
+    "You are an AI assistant that answers questions based on the provided business documents.\n\n"
+    "Context:\n{context}\n\n"
+    "Question: {input}\n\n"
+    "If the answer is not explicitly stated, respond with a helpful summary of the relevant information from the context."
+)
+
+
+def business_filter(business_id) -> qmodels.Filter:
+    return qmodels.Filter(
+        must=[qmodels.FieldCondition(key="business_id", match=qmodels.MatchValue(value=str(business_id)))]
+    )
+
+
+def infer_text_key(sample_payload: dict) -> str:
+    if not isinstance(sample_payload, dict):
+        return "page_content"
+    for k in POSSIBLE_TEXT_KEYS:
+        v = sample_payload.get(k, None)
+        if isinstance(v, str) and v.strip():
+            return k
+    # default to page_content if nothing fits
+    return "page_content"
+
+
+class RetrievalPipeline:
+    def __init__(
+        self, client, aclient, business_id: str, text_key: str, version: int, document_chain, local=None, lexical=None
+    ):
+        self.client = client
+        self.aclient = aclient
+        self.local = local  # LocalIndexStore, when small businesses are searched in-process
+        self.lexical = lexical  # LexicalIndexStore, when vector hits are fused with BM25
+        self.business_id = business_id
+        self.text_key = text_key
+        self.version = version
+        self.built_at = time.monotonic()
+        self.filter = business_filter(business_id)
+        self.search_params = search_params()
+        self.document_chain = document_chain
+
+    def _search_args(self, query_vector, k: int) -> dict:
+        return dict(
+            collection_name=COLLECTION_NAME,
+            query=query_vector,
+            query_filter=self.filter,
+            limit=k,
+            search_params=self.search_params,
+            with_payload=True,
+        )
+
+    def _documents(self, hits) -> List[Document]:
+        docs = []
+        for hit in hits:
+            payload = dict(hit.payload or {})
+            text = payload.pop(self.text_key, None)
+            payload["score"] = hit.score
+            docs.append(Document(page_content=text if isinstance(text, str) else "", metadata=payload))
+        return docs
+
+    def _local_index(self):
+        return self.local.get(self.business_id) if self.local is not None else None
+
+    def _lexical_ids(self, query: Optional[str]) -> Optional[List[str]]:
+        """BM25 ranking of the business's chunks, or None when there is no lexical index."""
+        index = self.lexical.get(self.business_id) if self.lexical is not None and query else None
+        if index is None:
+            return None
+        return [pid for pid, _ in index.search(query, settings.HYBRID_CANDIDATES)]
+
+    def _fuse(self, dense_hits, lexical_ids: List[str], k: int):
+        """RRF of both rankings; returns the fused (id, score) list, dense hits by id, and ids still lacking a payload."""
+        by_id = {str(h.id): h for h in dense_hits}
+        fused = reciprocal_rank_fusion([list(by_id), lexical_ids], k=settings.RRF_K)[:k]
+        return fused, by_id, [pid for pid, _ in fused if pid not in by_id]
+
+    def _fused_hits(self, fused, by_id: dict, fetched: dict) -> list:
+        hits = []
+        for pid, score in fused:
+            payload = by_id[pid].payload if pid in by_id else fetched.get(pid)
+            if payload is None:
+                continue  # deleted after the lexical index was built
+            hits.append(Hit(pid, score, payload))
+        return hits
+
+    def search(self, query_vector, k: int = RETRIEVAL_K, query: Optional[str] = None) -> List[Document]:
+        """
+        Top-k chunks of this business; the rest of the payload becomes metadata.
+        With `query` and a lexical index, vector and BM25 candidates are fused.
+        """
+        local = self._local_index()
+        lexical_ids = self._lexical_ids(query)
+        n = max(k, settings.HYBRID_CANDIDATES) if lexical_ids else k
+        if local is not None:
+            hits = local.search(query_vector, n)
+        else:
+            hits = self.client.query_points(**self._search_args(query_vector, n)).points
+        if not lexical_ids:
+            return self._documents(hits)
+
+        fused, by_id, missing = self._fuse(hits, lexical_ids, k)
+        if missing and local is not None:
+            fetched = {pid: local.payload(pid) for pid in missing}
+        elif missing:
+            records = self.client.retrieve(COLLECTION_NAME, ids=missing, with_payload=True)
+            fetched = {str(r.id): r.payload for r in records}
+        else:
+            fetched = {}
+        return self._documents(self._fused_hits(fused, by_id, fetched))
+
+    def generate(self, query: str, docs: List[Document]) -> str:
+        return self.document_chain.invoke({"input": query, "context": docs})
+
+    def stream(self, query: str, docs: List[Document]) -> Iterator[str]:
+        """Answer text pieces as the model produces them."""
+        return self.document_chain.stream({"input": query, "context": docs})
+
+    # Async variants for the async query path
+    async def _aload_indexes(self, lexical: bool = True):
+        """Open the business's local / lexical index files on a thread, so get() below only stats them."""
+        for store in (self.local, self.lexical if lexical else None):
+            if store is not None and store.needs_load(self.business_id):
+                await asyncio.to_thread(store.get, self.business_id)
+
+    async def asearch(self, query_vector, k: int = RETRIEVAL_K, query: Optional[str] = None) -> List[Document]:
+        await self._aload_indexes(lexical=bool(query))
+        local = self._local_index()
+        lexical_ids = self._lexical_ids(query)
+        n = max(k, settings.HYBRID_CANDIDATES) if lexical_ids else k
+        if local is not None:
+            hits = local.search(query_vector, n)
+        else:
+            hits = (await self.aclient.query_points(**self._search_args(query_vector, n))).points
+        if not lexical_ids:
+            return self._documents(hits)
+
+        fused, by_id, missing = self._fuse(hits, lexical_ids, k)
+        if missing and local is not None:
+            fetched = {pid: local.payload(pid) for pid in missing}
+        elif missing:
+            records = await self.aclient.retrieve(COLLECTION_NAME, ids=missing, with_payload=True)
+            fetched = {str(r.id): r.payload for r in records}
+        else:
+            fetched = {}
+        return self._documents(self._fused_hits(fused, by_id, fetched))
+
+    async def agenerate(self, query: str, docs: List[Document]) -> str:
+        return await self.document_chain.ainvoke({"input": query, "context": docs})
+
+    def astream(self, query: str, docs: List[Document]) -> AsyncIterator[str]:
+        return self.document_chain.astream({"input": query, "context": docs})
+
+
+class PipelineCache:
+    def __init__(self, client, ttl_seconds: int, max_businesses: int, aclient=None, local=None, lexical=None):
+        self.client = client
+        self.aclient = aclient
+        self.local = local
+        self.lexical = lexical
+        self.ttl_seconds = ttl_seconds
+        self.max_businesses = max_businesses
+        self._pipelines: "OrderedDict[str, RetrievalPipeline]" = OrderedDict()
+        self._document_chain = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------
+    # Shared objects
+    # ------------------------------------------------
+    @property
+    def document_chain(self):
+        with self._lock:
+            if self._document_chain is None:
+                prompt = PromptTemplate(input_variables=["context", "input"], template=PROMPT_TEMPLATE)
+                llm = ChatOpenAI(
+                    model_name="gpt-3.5-turbo",
+                    temperature=0,
+                    openai_api_key=settings.OPENAI_API_KEY,
+                )
+                self._document_chain = create_stuff_documents_chain(
+                    llm=llm,
+                    prompt=prompt,
+                    document_variable_name="context",
+                )
+            return self._document_chain
+
+    # ------------------------------------------------
+    # Per-business pipelines
+    # ------------------------------------------------
+    def _text_key(self, business_id: str, payloads: list) -> str:
+        text_key = infer_text_key(payloads[0] if payloads else {})
+        print(f"🧩 Business {business_id}: {len(payloads)} sample point(s), content_payload_key='{text_key}'")
+        return text_key
+
+    def _local_sample(self, business_id: str) -> Optional[list]:
+        """Sample payloads from the business's local snapshot, if it has one."""
+        local = self.local.get(business_id) if self.local is not None else None
+        return local.payloads[:1] if local is not None else None
+
+    def _sample_args(self, business_id: str) -> dict:
+        return dict(
+            collection_name=COLLECTION_NAME,
+            limit=1,
+            with_payload=True,
+            scroll_filter=business_filter(business_id),
+        )
+
+    def _count_args(self, business_id: str) -> dict:
+        return dict(collection_name=COLLECTION_NAME, count_filter=business_filter(business_id), exact=False)
+
+    def _cached(self, key: str, version: int) -> Optional[RetrievalPipeline]:
+        with self._lock:
+            pipeline = self._pipelines.get(key)
+            if pipeline is not None:
+                self._pipelines.move_to_end(key)
+        if (
+            pipeline is not None
+            and pipeline.version == version
+            and time.monotonic() - pipeline.built_at < self.ttl_seconds
+        ):
+            return pipeline
+        return None
+
+    def _store(self, key: str, text_key: str, version: int) -> RetrievalPipeline:
+        pipeline = RetrievalPipeline(
+            self.client, self.aclient, key, text_key, version, self.document_chain,
+            local=self.local, lexical=self.lexical,
+        )
+        with self._lock:
+            self._pipelines[key] = pipeline
+            self._pipelines.move_to_end(key)
+            while len(self._pipelines) > self.max_businesses:
+                self._pipelines.popitem(last=False)
+        return pipeline
+
+    def get(self, business_id, version: Optional[int] = None) -> RetrievalPipeline:
+        """Pipeline for the business at vectors `version` (default: the current one)."""
+        key = str(business_id)
+        if version is None:
+            version = versions.get_version(key, versions.VECTORS)
+        pipeline = self._cached(key, version)
+        if pipeline is None:
+            sample = self._local_sample(key)
+            if sample is None:
+                points, _ = self.client.scroll(**self._sample_args(key))
+                sample = [p.payload for p in points]
+            pipeline = self._store(key, self._text_key(key, sample), version)
+            if metrics.ENABLED and not metrics.knows_business(key):
+                # Tier label for the business's query metrics; training sets it too
+                metrics.set_business_size(key, self.client.count(**self._count_args(key)).count)
+        return pipeline
+
+    async def aget(self, business_id, version: Optional[int] = None) -> RetrievalPipeline:
+        key = str(business_id)
+        if version is None:
+            version = (await versions.aget_stamp(key))[1]
+        pipeline = self._cached(key, version)
+        if pipeline is None:
+            if self.local is not None and self.local.needs_load(key):
+                await asyncio.to_thread(self.local.get, key)
+            sample = self._local_sample(key)
+            if sample is None:
+                points, _ = await self.aclient.scroll(**self._sample_args(key))
+                sample = [p.payload for p in points]
+            pipeline = self._store(key, self._text_key(key, sample), version)
+            if metrics.ENABLED and not metrics.knows_business(key):
+                metrics.set_business_size(key, (await self.aclient.count(**self._count_args(key))).count)
+        return pipeline
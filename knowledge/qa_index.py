@@ -0,0 +1,173 @@
+# knowledge/qa_index.py
+# ----------------------------------------------------
+# In-memory manual Q/A match index
+# ----------------------------------------------------
+#
+# Same semantics as the original linear scan in answer_query: a Q/A matches
+# when the normalised query is contained in its question or the question is
+# contained in the query, and the first matching row wins.
+#
+#   question in query : the questions are hashed by text; at each position of
+#                       the query only the lengths of questions that start with
+#                       the trigram found there are probed.
+#   query in question : a character-trigram inverted index narrows the
+#                       candidates, which are then checked with `in`.
+
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from core.config import settings
+from knowledge import versions
+
+
+def normalize_query(query: str) -> str:
+    return (query or "").strip().lower()
+
+
+def normalize_question(question: str) -> str:
+    return (question or "").lower()
+
+
+_EMPTY = frozenset()
+# Posting sets intersected before verifying candidates directly
+_INTERSECT_LISTS = 4
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ManualQAIndex:
+    """Match structure over one business's Q/As, in row order."""
+
+    def __init__(self, rows: Iterable[Tuple[str, str, str]], version: int = 0):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.entries: List[Tuple[str, str, str]] = []  # (id, normalised question, answer)
+        self._by_question = {}  # question -> first row index
+        self._starts = defaultdict(set)  # leading trigram -> lengths of questions starting with it
+        self._short_lengths = set()  # lengths of questions shorter than a trigram
+        self._postings = defaultdict(set)  # trigram -> row indexes
+
+        for qa_id, question, answer in rows:
+            qq = normalize_question(question)
+            if not qq:
+                continue
+            i = len(self.entries)
+            self.entries.append((str(qa_id), qq, answer))
+            self._by_question.setdefault(qq, i)
+            if len(qq) < 3:
+                self._short_lengths.add(len(qq))
+            else:
+                self._starts[qq[:3]].add(len(qq))
+            for gram in _trigrams(qq):
+                self._postings[gram].add(i)
+        self._max_length = max((len(q) for q in self._by_question), default=0)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _question_in_query(self, qnorm: str) -> Optional[int]:
+        best = None
+        n = len(qnorm)
+        for start in range(n):
+            lengths = self._starts.get(qnorm[start:start + 3], ())
+            if self._short_lengths:
+                lengths = self._short_lengths.union(lengths)
+            for length in lengths:
+                if start + length > n:
+                    continue
+                i = self._by_question.get(qnorm[start:start + length])
+                if i is not None and (best is None or i < best):
+                    best = i
+        return best
+
+    def _query_in_question(self, qnorm: str, below: Optional[int]) -> Optional[int]:
+        limit = len(self.entries) if below is None else below
+        if len(qnorm) > self._max_length:
+            return None
+        if len(qnorm) < 3:
+            candidates = range(limit)
+        else:
+            postings = sorted((self._postings.get(g, _EMPTY) for g in _trigrams(qnorm)), key=len)
+            # The rarest few trigrams narrow enough; the `in` check below is exact anyway
+            candidates = postings[0]
+            for other in postings[1:_INTERSECT_LISTS]:
+                if not candidates:
+                    return None
+                candidates = candidates & other
+            candidates = sorted(i for i in candidates if i < limit)
+        for i in candidates:
+            if qnorm in self.entries[i][1]:
+                return i
+        return None
+
+    def match(self, query: str) -> Optional[Tuple[str, str, str]]:
+        """First (id, question, answer) whose question contains / is contained in the query."""
+        if not self.entries:
+            return None
+        qnorm = normalize_query(query)
+        if not qnorm:
+            return self.entries[0]
+        best = self._question_in_query(qnorm)
+        other = self._query_in_question(qnorm, best)
+        if other is not None:
+            best = other
+        return self.entries[best] if best is not None else None
+
+
+class QAIndexRegistry:
+    """
+    One index per business, rebuilt when the business's Q/A version stamp
+    moves (a Q/A added or deleted by any process) or after
+    QA_INDEX_TTL_SECONDS. Least recently used businesses are dropped.
+    """
+
+    def __init__(self, ttl_seconds: int, max_businesses: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_businesses = max_businesses
+        self._indexes: "OrderedDict[str, ManualQAIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def peek(self, business_id, version: Optional[int] = None) -> Optional[ManualQAIndex]:
+        """The cached index if it is still current (at Q/A `version`, default: now), without rebuilding."""
+        key = str(business_id)
+        if version is None:
+            version = versions.get_version(key, versions.QA)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+        if (
+            index is not None
+            and index.version == version
+            and time.monotonic() - index.built_at < self.ttl_seconds
+        ):
+            return index
+        return None
+
+    def get(
+        self, business_id, load_rows: Callable[[], Iterable[Tuple[str, str, str]]], version: Optional[int] = None
+    ) -> ManualQAIndex:
+        if version is None:
+            version = versions.get_version(str(business_id), versions.QA)
+        index = self.peek(business_id, version)
+        if index is not None:
+            return index
+        return self.put(business_id, load_rows(), version)
+
+    def put(self, business_id, rows: Iterable[Tuple[str, str, str]], version: int) -> ManualQAIndex:
+        """Build and cache an index from rows loaded at Q/A version `version`."""
+        key = str(business_id)
+        index = ManualQAIndex(rows, version)
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_businesses:
+                self._indexes.popitem(last=False)
+        return index
+
+
+qa_indexes = QAIndexRegistry(settings.QA_INDEX_TTL_SECONDS, settings.QA_INDEX_MAX_BUSINESSES)
@@ -0,0 +1,210 @@
+# knowledge/qa_semantic.py
+# ----------------------------------------------------
+# Semantic manual Q/A matching (NumPy matrix per business)
+# ----------------------------------------------------
+#
+# The questions of a business's Q/As are embedded once and kept as rows of a
+# contiguous, L2-normalised float32 matrix, so matching a query is a single
+# matrix-vector product. add/delete patch the matrix in place instead of
+# re-embedding every question, and a refresh from the database only embeds
+# the questions the previous matrix did not have.
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from core.config import settings
+from knowledge import versions
+from knowledge.embedding import embed_chunks
+
+
+def _normalize(vectors) -> np.ndarray:
+    arr = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(arr, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return arr / norms
+
+
+class SemanticQAIndex:
+    """Question embeddings of one business; rows grow with amortised doubling."""
+
+    def __init__(self, dim: int, version: int = 0):
+        self.version = version
+        self.built_at = time.monotonic()
+        self._matrix = np.empty((0, dim), dtype=np.float32)
+        self._size = 0
+        self._entries: List[Tuple[str, str, str]] = []  # (id, question, answer) per matrix row
+        self._row_of = {}  # qa id -> row
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def add(self, entries: List[Tuple[str, str, str]], vectors):
+        if not entries:
+            return
+        rows = _normalize(vectors)
+        with self._lock:
+            needed = self._size + len(entries)
+            if needed > self._matrix.shape[0]:
+                grown = np.empty((max(needed, 2 * self._matrix.shape[0], 16), rows.shape[1]), dtype=np.float32)
+                grown[: self._size] = self._matrix[: self._size]
+                self._matrix = grown
+            self._matrix[self._size:needed] = rows
+            for offset, entry in enumerate(entries):
+                self._row_of[entry[0]] = self._size + offset
+                self._entries.append(entry)
+            self._size = needed
+
+    def snapshot(self) -> Tuple[dict, List[Tuple[str, str, str]], np.ndarray]:
+        """(qa id -> row, entries, matrix rows) as of now, for rebuilding without re-embedding."""
+        with self._lock:
+            return dict(self._row_of), list(self._entries), self._matrix[: self._size].copy()
+
+    def remove(self, qa_id: str):
+        """Move the last row into the removed slot so the matrix stays contiguous."""
+        with self._lock:
+            row = self._row_of.pop(qa_id, None)
+            if row is None:
+                return
+            last = self._size - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._entries[row] = self._entries[last]
+                self._row_of[self._entries[row][0]] = row
+            self._entries.pop()
+            self._size = last
+
+    def match(self, query_vector, threshold: float) -> Optional[Tuple[str, str, str, float]]:
+        """Best (id, question, answer, similarity) at or above `threshold`."""
+        with self._lock:
+            if not self._size:
+                return None
+            scores = self._matrix[: self._size] @ _normalize(query_vector)
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < threshold:
+                return None
+            return (*self._entries[best], score)
+
+
+class SemanticQARegistry:
+    """
+    One matrix per business. A matrix whose version matches the business's Q/A
+    stamp is patched by on_added / on_removed; otherwise (another process
+    changed the Q/As, or the TTL ran out) it is refreshed from the rows, reusing
+    the rows of Q/As it already had and embedding only the new questions.
+    """
+
+    def __init__(self, ttl_seconds: int, max_businesses: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_businesses = max_businesses
+        self._indexes: "OrderedDict[str, SemanticQAIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, key: str) -> Optional[SemanticQAIndex]:
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+            return index
+
+    def _store(self, key: str, index: SemanticQAIndex):
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            while len(self._indexes) > self.max_businesses:
+                self._indexes.popitem(last=False)
+
+    def peek(self, business_id, version: Optional[int] = None) -> Optional[SemanticQAIndex]:
+        """The cached matrix if it is still current (at Q/A `version`, default: now), without rebuilding."""
+        key = str(business_id)
+        if version is None:
+            version = versions.get_version(key, versions.QA)
+        index = self._cached(key)
+        if (
+            index is not None
+            and index.version == version
+            and time.monotonic() - index.built_at < self.ttl_seconds
+        ):
+            return index
+        return None
+
+    def get(
+        self,
+        business_id,
+        load_rows: Callable[[], Iterable[Tuple[str, str, str]]],
+        embedder,
+        version: Optional[int] = None,
+    ) -> SemanticQAIndex:
+        if version is None:
+            version = versions.get_version(str(business_id), versions.QA)
+        index = self.peek(business_id, version)
+        if index is not None:
+            return index
+        return self.put(business_id, load_rows(), version, embedder)
+
+    def put(self, business_id, rows: Iterable[Tuple[str, str, str]], version: int, embedder) -> SemanticQAIndex:
+        """Cache the question matrix for rows loaded at Q/A version `version`."""
+        key = str(business_id)
+        entries = [(str(i), q, a) for i, q, a in rows if (q or "").strip()]
+        previous = self._cached(key)
+        row_of, old_entries, old_matrix = previous.snapshot() if previous is not None else ({}, [], None)
+
+        # Q/As the previous matrix already holds (same id, same question) keep their rows
+        kept, todo = [], []
+        for n, entry in enumerate(entries):
+            row = row_of.get(entry[0])
+            if row is not None and old_entries[row][1] == entry[1]:
+                kept.append((n, row))
+            else:
+                todo.append(n)
+        fresh = embed_chunks(embedder, [entries[n][1] for n in todo]) if todo else []
+
+        dim = old_matrix.shape[1] if old_matrix is not None else len(fresh[0]) if fresh else 1536
+        vectors = np.empty((len(entries), dim), dtype=np.float32)
+        for n, row in kept:
+            vectors[n] = old_matrix[row]
+        if todo:
+            vectors[todo] = _normalize(fresh)
+
+        index = SemanticQAIndex(dim, version)
+        index.add(entries, vectors)
+        self._store(key, index)
+        if previous is not None:
+            print(
+                f"🔁 Semantic Q/A index for business {key}: {len(kept)} kept, {len(todo)} embedded, "
+                f"{len(row_of) - len(kept)} dropped"
+            )
+        return index
+
+    def on_added(self, business_id, qa_id, question: str, answer: str, new_version: int, embedder):
+        index = self._cached(str(business_id))
+        if index is None:
+            return
+        if index.version != new_version - 1:
+            self._drop(str(business_id))
+            return
+        if (question or "").strip():
+            index.add([(str(qa_id), question, answer)], [embedder.embed_query(question)])
+        index.version = new_version
+
+    def on_removed(self, business_id, qa_id, new_version: int):
+        index = self._cached(str(business_id))
+        if index is None:
+            return
+        if index.version != new_version - 1:
+            self._drop(str(business_id))
+            return
+        index.remove(str(qa_id))
+        index.version = new_version
+
+    def _drop(self, key: str):
+        with self._lock:
+            self._indexes.pop(key, None)
+
+
+semantic_qa = SemanticQARegistry(settings.QA_INDEX_TTL_SECONDS, settings.QA_INDEX_MAX_BUSINESSES)
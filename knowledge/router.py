@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Form
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-import tempfile, os
+import tempfile, os, hashlib
+from uuid import UUID
 
-from knowledge import service, schemas
+from knowledge import service, schemas, jobs
+from knowledge.extraction import spool_to_disk
 from core.db import get_db
+from core.utils import sse_event
 
 router = APIRouter(prefix="/knowledge", tags=["Knowledge Studio"])
 
@@ -17,17 +21,18 @@ def upload_knowledge(
     if not file.filename.lower().endswith((".pdf", ".docx")):
         raise HTTPException(status_code=400, detail="Only PDF or DOCX files are supported.")
 
+    hasher = hashlib.sha256()
     with tempfile.NamedTemporaryFile(delete=False, suffix=file.filename) as tmp:
-        tmp.write(file.file.read())
+        spool_to_disk(file.file, tmp, hasher=hasher)
         tmp_path = tmp.name
 
     try:
-        text = service.extract_text(tmp_path)
-        record = service.upload_file(db, business_id, file.filename, text)
+        record, created = service.ingest_upload(db, business_id, file.filename, tmp_path, hasher.hexdigest())
     finally:
         os.remove(tmp_path)
 
-    return {"id": str(record.id), "file_name": record.file_name, "message": "File uploaded & processed successfully."}
+    message = "File uploaded & processed successfully." if created else "File already uploaded; existing record reused."
+    return {"id": str(record.id), "file_name": record.file_name, "message": message}
 
 
 @router.post("/qa")
@@ -37,13 +42,34 @@ def add_manual_qa(payload: schemas.ManualQAInput, db: Session = Depends(get_db))
 
 @router.post("/train", response_model=schemas.TrainResponse)
 def train_bot(payload: schemas.TrainRequest, db: Session = Depends(get_db)):
-    return service.train_business_knowledge(db, payload.business_id)
+    job = jobs.enqueue_training(db, payload.business_id)
+    return {"message": "⏳ Training queued.", "job_id": str(job.id), "status": job.status}
+
+
+@router.get("/train/{job_id}", response_model=schemas.TrainJobResponse)
+def get_training_job(job_id: UUID, db: Session = Depends(get_db)):
+    job = jobs.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Training job not found.")
+    return {
+        "job_id": str(job.id),
+        "business_id": str(job.business_id),
+        "status": job.status,
+        "chunks_total": job.chunks_total,
+        "chunks_embedded": job.chunks_embedded,
+        "chunks_upserted": job.chunks_upserted,
+        "message": job.message,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
 
 
 
 @router.post("/test")
-def test_agent(payload: schemas.QuestionInput):
-    result = service.answer_query(payload.business_id, payload.query)
+async def test_agent(payload: schemas.QuestionInput):
+    result = await service.aanswer_query(payload.business_id, payload.query)
 
     # Safely extract text from nested dicts
     if isinstance(result, dict):
@@ -63,6 +89,24 @@ def test_agent(payload: schemas.QuestionInput):
     return {"result": answer}
 
 
+@router.post("/test/stream")
+async def test_agent_stream(payload: schemas.QuestionInput):
+    """Server-Sent Events: `token` events, then `done` with the answer, source and ttft_ms."""
+    events = (
+        sse_event(event, data) async for event, data in service.astream_answer(payload.business_id, payload.query)
+    )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+
+@router.get("/stats")
+def get_stats(db: Session = Depends(get_db)):
+    return service.get_stats(db)
+
 
 @router.get("/qa/{business_id}", response_model=schemas.ManualQAListResponse)
 def get_manual_qa(business_id: str, db: Session = Depends(get_db)):
@@ -21,6 +21,22 @@ class ManualQAInput(BaseModel):
 
 class TrainResponse(BaseModel):
     message: str
+    job_id: Optional[str] = None
+    status: Optional[str] = None
+
+
+class TrainJobResponse(BaseModel):
+    job_id: str
+    business_id: str
+    status: str
+    chunks_total: int
+    chunks_embedded: int
+    chunks_upserted: int
+    message: Optional[str] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
 
 class TrainRequest(BaseModel):
     business_id: str
@@ -3,95 +3,183 @@
 # Cleaned & Organized Version — 2025 Edition
 # ----------------------------------------------------
 
+import asyncio
+import threading
 import uuid
-import fitz
-import docx2txt
+import hashlib
+from functools import partial
+from itertools import tee
 from datetime import datetime
-from sqlalchemy.orm import Session
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain.prompts import PromptTemplate
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains import create_retrieval_chain
-from qdrant_client import QdrantClient
+from sqlalchemy import func, distinct, select
+from sqlalchemy.orm import Session, defer
+from langchain_openai import OpenAIEmbeddings
+from qdrant_client import QdrantClient, AsyncQdrantClient
 from qdrant_client.http import models as qmodels
-from langchain_community.vectorstores import Qdrant
 
 from core.config import settings
-from core.db import get_db
+from core.db import SessionLocal, AsyncSessionLocal
+from core.utils import StageTimer
+from core import metrics
 from knowledge.models import Knowledge, ManualQA
-
-
-from typing import Optional, List
-from langchain_qdrant import Qdrant as QdrantVS
-from langchain_core.prompts import PromptTemplate
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains import create_retrieval_chain
-
-from core.config import settings
-openaikey=settings.OPENAI_API_KEY
-# Helper: infer which payload key holds the chunk text
-POSSIBLE_TEXT_KEYS = ("page_content", "text", "content", "chunk", "body", "document", "raw_text")
+from knowledge.embedding import iter_embeddings, count_tokens
+from knowledge.upsert import upsert_stream
+from knowledge.extraction import iter_pages
+from core.storage import blob_store, BLOB_SCHEME
+from knowledge import versions
+from knowledge.qa_index import qa_indexes, normalize_query
+from knowledge.qa_semantic import semantic_qa
+from knowledge.chunking import make_splitter, iter_chunks
+from knowledge.embedding_cache import EmbeddingCache, CachedEmbeddings
+from knowledge.pipeline import PipelineCache
+from knowledge.collection import create_collection, ensure_payload_indexes
+from knowledge.answer_cache import answer_cache, knowledge_stamp
+from knowledge.context import pack_context
+from knowledge.local_index import local_indexes
+from knowledge.lexical import BM25Builder, lexical_indexes
+from knowledge.singleflight import query_flights
+
+from typing import Optional, List, Iterator, AsyncIterator
+
+# Per-chunk payload fields that identify where the chunk came from
+SOURCE_PAYLOAD_FIELDS = ("source", "knowledge_id", "qa_id", "chunk_index")
 
 # ----------------------------------------------------
 # Qdrant Setup
 # ----------------------------------------------------
-qdrant = QdrantClient(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY)
+class _LocalAsyncQdrant:
+    """Async calls on the in-memory client: local mode keeps one store per client object."""
+
+    def __init__(self, client: QdrantClient):
+        self._client = client
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+
+if settings.QDRANT_URL == ":memory:":
+    # In-process Qdrant (benchmarks, offline development); nothing is persisted
+    qdrant = QdrantClient(location=":memory:")
+    aqdrant = _LocalAsyncQdrant(qdrant)
+else:
+    qdrant = QdrantClient(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY)
+    aqdrant = AsyncQdrantClient(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY)
 embeddings = OpenAIEmbeddings(openai_api_key=settings.OPENAI_API_KEY)
+if settings.EMBED_CACHE_ENABLED:
+    embeddings = CachedEmbeddings(
+        embeddings,
+        EmbeddingCache(
+            settings.EMBED_CACHE_PATH,
+            max_bytes=settings.EMBED_CACHE_MAX_MB * 1024 * 1024,
+            memory_items=settings.EMBED_CACHE_MEMORY_ITEMS,
+        ),
+        model_name=embeddings.model,
+    )
+pipelines = PipelineCache(
+    qdrant,
+    aclient=aqdrant,
+    local=local_indexes if settings.LOCAL_INDEX_ENABLED else None,
+    lexical=lexical_indexes if settings.LEXICAL_INDEX_ENABLED else None,
+    ttl_seconds=settings.PIPELINE_CACHE_TTL_SECONDS,
+    max_businesses=settings.PIPELINE_CACHE_MAX_BUSINESSES,
+)
 
 def ensure_collection():
-    """Ensure Qdrant collection and index exist."""
+    """Ensure Qdrant collection and indexes exist."""
     try:
-        collections = [c.name for c in qdrant.get_collections().collections]
-        if "chatflow_vectors" not in collections:
-            qdrant.create_collection(
-                collection_name="chatflow_vectors",
-                vectors_config=qmodels.VectorParams(size=1536, distance=qmodels.Distance.COSINE),
-            )
-            print("✅ Created Qdrant collection 'chatflow_vectors'")
-
-        # Ensure payload index for filtering
-        qdrant.create_payload_index(
-            collection_name="chatflow_vectors",
-            field_name="business_id",
-            field_schema="keyword",
-        )
+        # collection_exists also resolves the alias left by a layout migration
+        if not qdrant.collection_exists("chatflow_vectors"):
+            create_collection(qdrant)
     except Exception as e:
         if "already exists" not in str(e):
             print(f"⚠️ ensure_collection warning: {e}")
 
-ensure_collection()
-
+    # Ensure payload indexes for filtering (tenant + per-source deletes)
+    ensure_payload_indexes(qdrant)
 
-# ----------------------------------------------------
-# 1. Text Extraction
-# ----------------------------------------------------
-def extract_text(file_path: str):
-    if file_path.endswith(".pdf"):
-        text = ""
-        with fitz.open(file_path) as pdf:
-            for page in pdf:
-                text += page.get_text()
-        return text
-    elif file_path.endswith(".docx"):
-        return docx2txt.process(file_path)
-    else:
-        raise ValueError("Unsupported file format. Use PDF or DOCX.")
+ensure_collection()
 
 
 # ----------------------------------------------------
-# 2. Save Uploaded File to DB
+# 1. Save Uploaded File to DB
 # ----------------------------------------------------
-def upload_file(db: Session, business_id: str, file_name: str, text: str):
-    record = Knowledge(business_id=business_id, file_name=file_name, content=text)
+def upload_file(
+    db: Session,
+    business_id: str,
+    file_name: str,
+    text: Optional[str] = None,
+    content_hash: Optional[str] = None,
+    file_url: Optional[str] = None,
+):
+    record = Knowledge(
+        business_id=business_id, file_name=file_name, content=text, content_hash=content_hash, file_url=file_url
+    )
     db.add(record)
     db.commit()
     db.refresh(record)
     return record
 
 
+# Upload outcomes since process start (see get_stats); uploads run on threadpool threads
+_upload_counts = {"uploads": 0, "duplicates": 0, "text_reused": 0, "extracted": 0}
+_upload_counts_lock = threading.Lock()
+
+
+def _count_upload(outcome: str):
+    with _upload_counts_lock:
+        _upload_counts[outcome] += 1
+
+
+def _blob_key(content_hash: str) -> str:
+    return f"knowledge/{content_hash[:2]}/{content_hash}.txt.zst"
+
+
+def ingest_upload(db: Session, business_id: str, file_name: str, file_path: str, content_hash: str):
+    """
+    Store an uploaded file, deduplicating by content hash:
+    - same file already uploaded by this business -> return that record
+    - same file uploaded by another business -> share its text blob, skip parsing
+    - otherwise extract page by page straight into a compressed blob
+    The row itself only keeps metadata and the blob URL. Returns (record, created).
+    """
+    _count_upload("uploads")
+    existing = (
+        db.query(Knowledge)
+        .options(defer(Knowledge.content))
+        .filter(Knowledge.business_id == business_id, Knowledge.content_hash == content_hash)
+        .first()
+    )
+    if existing:
+        _count_upload("duplicates")
+        print(f"♻️ Duplicate upload of '{file_name}' for business {business_id}; reusing {existing.id}")
+        return existing, False
+
+    file_url = BLOB_SCHEME + _blob_key(content_hash)
+    if blob_store.exists(file_url):
+        _count_upload("text_reused")
+    else:
+        # Rows from before blob storage still carry their text inline
+        legacy = (
+            db.query(Knowledge)
+            .filter(Knowledge.content_hash == content_hash, Knowledge.content.isnot(None))
+            .first()
+        )
+        if legacy:
+            _count_upload("text_reused")
+            pieces = [legacy.content]
+        else:
+            _count_upload("extracted")
+            pieces = iter_pages(file_path)
+        file_url = blob_store.put_text(_blob_key(content_hash), pieces)
+    return upload_file(db, business_id, file_name, content_hash=content_hash, file_url=file_url), True
+
+
 # ----------------------------------------------------
-# 3. Add Manual Q/A
+# 2. Add Manual Q/A
 # ----------------------------------------------------
 def add_manual_qa(db: Session, payload):
     record = ManualQA(
@@ -102,48 +190,221 @@ def add_manual_qa(db: Session, payload):
         created_at=datetime.utcnow(),
     )
     db.add(record)
+    version = versions.bump_version(db, record.business_id, versions.QA)
     db.commit()
     db.refresh(record)
+    if settings.QA_SEMANTIC_ENABLED:
+        try:
+            semantic_qa.on_added(record.business_id, record.id, record.question, record.answer, version, embeddings)
+        except Exception as e:
+            print(f"⚠️ Semantic Q/A index update failed (will rebuild on next query): {e}")
     return {"id": str(record.id), "message": "✅ Manual Q/A saved successfully."}
 
 
 # ----------------------------------------------------
-# 4. Train Knowledge (Docs + Manual QAs)
+# 3. Train Knowledge (Docs + Manual QAs)
 # ----------------------------------------------------
-def train_business_knowledge(db: Session, business_id: str):
-    docs = db.query(Knowledge).filter(Knowledge.business_id == business_id).all()
-    qas = db.query(ManualQA).filter(ManualQA.business_id == business_id).all()
+def _business_filter(business_id: str) -> qmodels.Filter:
+    return qmodels.Filter(
+        must=[qmodels.FieldCondition(key="business_id", match=qmodels.MatchValue(value=str(business_id)))]
+    )
 
-    if not docs and not qas:
-        return {"message": "⚠️ No documents or Q/A found for this business."}
 
-    # Combine texts
-    doc_texts = [d.content for d in docs]
-    qa_texts = [f"Q: {q.question}\nA: {q.answer}" for q in qas]
-    combined_text = " ".join(doc_texts + qa_texts)
+def _chunk_point_id(business_id: str, source: str, chunk: str) -> str:
+    """Content-addressed point ID: the same chunk of the same source always maps to the same point."""
+    digest = hashlib.sha256(f"{business_id}\x1f{source}\x1f{chunk}".encode("utf-8")).hexdigest()
+    return str(uuid.UUID(digest[:32]))
 
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=150)
-    chunks = splitter.split_text(combined_text)
 
-    vectors = [embeddings.embed_query(chunk) for chunk in chunks]
+def _existing_points(business_id: str) -> dict:
+    """Point ID -> source metadata for every point currently stored for a business."""
+    points_by_id, offset = {}, None
+    while True:
+        points, offset = qdrant.scroll(
+            collection_name="chatflow_vectors",
+            scroll_filter=_business_filter(business_id),
+            limit=1000,
+            offset=offset,
+            with_payload=list(SOURCE_PAYLOAD_FIELDS),
+            with_vectors=False,
+        )
+        for p in points:
+            points_by_id[str(p.id)] = p.payload or {}
+        if offset is None:
+            return points_by_id
+
+
+def _source_filter(business_id: str, field: str, value: str) -> qmodels.Filter:
+    return qmodels.Filter(
+        must=[
+            qmodels.FieldCondition(key="business_id", match=qmodels.MatchValue(value=str(business_id))),
+            qmodels.FieldCondition(key=field, match=qmodels.MatchValue(value=str(value))),
+        ]
+    )
+
+
+def _document_pieces(doc: Knowledge) -> Iterator[str]:
+    """Text of a Knowledge row, streamed from its blob (or the legacy inline column)."""
+    if doc.file_url:
+        return blob_store.open_text(doc.file_url)
+    return iter([doc.content or ""])
+
+
+def _iter_source_chunks(business_id: str, sources, splitter):
+    """Yield (point_id, source, meta, chunk_index, chunk) for every chunk of every source."""
+    for source, meta, open_pieces in sources:
+        for index, chunk in enumerate(iter_chunks(open_pieces(), splitter)):
+            yield _chunk_point_id(business_id, source, chunk), source, meta, index, chunk
+
+
+def _sync_local_index(business_id: str):
+    """Mirror a small business's points into its local snapshot; large ones stay on Qdrant only."""
+    count = qdrant.count(
+        collection_name="chatflow_vectors", count_filter=_business_filter(business_id), exact=True
+    ).count
+    if count > local_indexes.max_points:
+        local_indexes.drop(business_id)
+        return
+
+    ids, vectors, payloads = [], [], []
+    offset = None
+    while True:
+        points, offset = qdrant.scroll(
+            collection_name="chatflow_vectors",
+            scroll_filter=_business_filter(business_id),
+            limit=256,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        for p in points:
+            ids.append(p.id)
+            vectors.append(p.vector)
+            payloads.append(p.payload)
+        if offset is None:
+            break
+    local_indexes.write(business_id, ids, vectors, payloads)
+    print(f"💾 Business {business_id}: local index snapshot with {len(ids)} points")
+
 
-    # ✅ Include both business_id and actual text payload
-    payloads = [{"business_id": str(business_id), "page_content": chunk} for chunk in chunks]
+def train_business_knowledge(db: Session, business_id: str, progress=None):
+    """
+    Sync the business's vectors with its documents and Q/As.
+    `progress`, if given, is called with total= / embedded= / upserted= counts.
+    """
+    timer = StageTimer()
+    failed = False
+    try:
+        return _train_business_knowledge(db, business_id, progress or (lambda **counts: None), timer)
+    except Exception:
+        failed = True
+        raise
+    finally:
+        metrics.observe_timer("train", business_id, timer, error=failed)
+
+
+def _train_business_knowledge(db: Session, business_id: str, progress, timer: StageTimer):
+    # Document text is streamed from blob storage, never loaded with the rows
+    with timer.stage("load"):
+        docs = (
+            db.query(Knowledge)
+            .options(defer(Knowledge.content))
+            .filter(Knowledge.business_id == business_id)
+            .all()
+        )
+        qas = db.query(ManualQA).filter(ManualQA.business_id == business_id).all()
 
-    qdrant.upsert(
-        collection_name="chatflow_vectors",
-        points=[
-            qmodels.PointStruct(
-                id=str(uuid.uuid4()),
-                vector=v,
-                payload=p,
+    # Each document / Q&A is chunked on its own and tagged with the row it came from
+    sources = [(f"knowledge:{d.id}", {"knowledge_id": str(d.id)}, partial(_document_pieces, d)) for d in docs]
+    sources += [
+        (f"qa:{q.id}", {"qa_id": str(q.id)}, partial(iter, [f"Q: {q.question}\nA: {q.answer}"]))
+        for q in qas
+    ]
+    splitter = make_splitter()
+
+    # Pass 1: point IDs and source metadata only, so chunk text is not held for the whole tenant
+    # The BM25 index only needs term counts, so it is built in the same pass
+    wanted = {}  # point_id -> source metadata
+    bm25 = BM25Builder()
+    with timer.stage("chunk"):
+        for pid, source, meta, index, chunk in _iter_source_chunks(business_id, sources, splitter):
+            wanted.setdefault(pid, {"source": source, **meta, "chunk_index": index})
+            bm25.add(pid, chunk)
+    metrics.set_business_size(business_id, len(wanted))
+
+    # Diff against what's already in Qdrant: embed only new chunks, drop vanished ones
+    with timer.stage("diff"):
+        existing = _existing_points(business_id)
+    new_ids = {pid for pid in wanted if pid not in existing}
+    stale_ids = [pid for pid in existing if pid not in wanted]
+    progress(total=len(new_ids))
+
+    if new_ids:
+        # Pass 2: re-stream only the sources that gained chunks
+        changed = {wanted[pid]["source"] for pid in new_ids}
+
+        def new_points():
+            pending = set(new_ids)
+            todo = [s for s in sources if s[0] in changed]
+            for pid, _, _, _, chunk in _iter_source_chunks(business_id, todo, splitter):
+                if pid in pending:
+                    pending.discard(pid)
+                    # ✅ Include business_id, source metadata and actual text payload
+                    yield pid, {"business_id": str(business_id), **wanted[pid], "page_content": chunk}
+
+        # Embedding feeds the upsert pipeline lazily, so neither texts nor vectors pile up
+        for_embedding, for_upsert = tee(new_points())
+        vectors = iter_embeddings(
+            embeddings,
+            (payload["page_content"] for _, payload in for_embedding),
+            on_progress=lambda n: progress(embedded=n),
+        )
+        with timer.stage("embed_upsert"):
+            upsert_stream(
+                qdrant,
+                "chatflow_vectors",
+                (
+                    qmodels.PointStruct(id=pid, vector=v, payload=payload)
+                    for (pid, payload), v in zip(for_upsert, vectors)
+                ),
+                on_progress=lambda n: progress(upserted=n),
             )
-            for v, p in zip(vectors, payloads)
-        ],
-    )
 
-    print(f"✅ Added {len(chunks)} chunks with text payloads for business {business_id}")
-    return {"message": f"✅ Training completed for {len(chunks)} chunks with full context."}
+    # Points kept from an earlier run may predate the source metadata; patch payload only
+    patched = 0
+    with timer.stage("patch"):
+        for pid, old_payload in existing.items():
+            meta = wanted.get(pid)
+            if meta is None:
+                continue
+            if any(old_payload.get(k) != v for k, v in meta.items()):
+                qdrant.set_payload(collection_name="chatflow_vectors", payload=meta, points=[pid])
+                patched += 1
+
+    if stale_ids:
+        with timer.stage("delete"):
+            qdrant.delete(
+                collection_name="chatflow_vectors",
+                points_selector=qmodels.PointIdsList(points=stale_ids),
+            )
+
+    if new_ids or stale_ids:
+        # Committed by the caller together with the job's completion
+        versions.bump_version(db, business_id, versions.VECTORS)
+    with timer.stage("indexes"):
+        if settings.LEXICAL_INDEX_ENABLED and (new_ids or stale_ids or not lexical_indexes.exists(business_id)):
+            lexical_indexes.write(business_id, bm25)
+        if settings.LOCAL_INDEX_ENABLED and (new_ids or stale_ids or patched or not local_indexes.exists(business_id)):
+            _sync_local_index(business_id)
+
+    if not docs and not qas:
+        return {"message": "⚠️ No documents or Q/A found for this business."}
+
+    print(f"✅ Business {business_id}: {len(new_ids)} chunks embedded, {len(stale_ids)} removed, {len(wanted)} total")
+    return {
+        "message": f"✅ Training completed: {len(new_ids)} new chunks embedded, "
+        f"{len(stale_ids)} removed, {len(wanted)} chunks in total."
+    }
 
 
 
@@ -177,158 +438,385 @@ def get_manual_qa(db: Session, business_id: str):
 
 
 # ----------------------------------------------------
-# 5. Query Chatbot
+# 4. Query Chatbot
 # ----------------------------------------------------
 
-def _infer_text_key(sample_payload: dict) -> str:
-    if not isinstance(sample_payload, dict):
-        return "page_content"
-    for k in POSSIBLE_TEXT_KEYS:
-        v = sample_payload.get(k, None)
-        if isinstance(v, str) and v.strip():
-            return k
-    # default to page_content if nothing fits
-    return "page_content"
-
-def answer_query(business_id: str, query: str):
+def _load_manual_qa_rows(business_id: str):
+    db = SessionLocal()
     try:
-        print(f"🔍 Query received for business={business_id}: '{query}'")
-
-        # --- 1️⃣ Manual Q/A first (case-insensitive contains, either direction) ---
-        db: Session = next(get_db())
-        manual_qas = db.query(ManualQA).filter(ManualQA.business_id == business_id).all()
-        qnorm = (query or "").strip().lower()
-        for qa in manual_qas:
-            qqa = (qa.question or "").lower()
-            if not qqa:
-                continue
-            if qnorm in qqa or qqa in qnorm:
-                db.close()
-                print(f"✅ Answered from Manual QA: {qa.question}")
-                return {"result": {"response": {"query": query, "result": qa.answer, "source": "manual_qa"}}}
+        return (
+            db.query(ManualQA.id, ManualQA.question, ManualQA.answer)
+            .filter(ManualQA.business_id == business_id)
+            .order_by(ManualQA.created_at)
+            .all()
+        )
+    finally:
         db.close()
 
-        # --- 2️⃣ Probe Qdrant for payload shape, then set up vectorstore with proper keys ---
-        scroll_res = qdrant.scroll(
-            collection_name="chatflow_vectors",
-            limit=3,
-            with_payload=True,
-            scroll_filter=qmodels.Filter(
-                must=[qmodels.FieldCondition(
-                    key="business_id",
-                    match=qmodels.MatchValue(value=str(business_id))
-                )]
-            ),
-        )
-        points = scroll_res[0] if scroll_res and len(scroll_res) > 0 else []
-        print(f"🔍 Found {len(points)} stored points in Qdrant for business_id={business_id}")
 
-        sample_payload = points[0].payload if points else {}
-        text_key = _infer_text_key(sample_payload)
-        print(f"🧩 Using content_payload_key='{text_key}'")
+def _query_response(query: str, result: str, source: str) -> dict:
+    return {"result": {"response": {"query": query, "result": result, "source": source}}}
 
-        vectorstore = QdrantVS(
-            client=qdrant,
-            collection_name="chatflow_vectors",
-            embeddings=embeddings,             # your existing embeddings
-            content_payload_key=text_key,      # 👈 critical fix
-            metadata_payload_key="metadata",   # adjust if you used a different meta field
-        )
 
-        retriever = vectorstore.as_retriever(
-            search_kwargs={
-                "filter": qmodels.Filter(
-                    must=[qmodels.FieldCondition(
-                        key="business_id",
-                        match=qmodels.MatchValue(value=str(business_id))
-                    )]
-                ),
-                "k": 8,
-            }
-        )
+NO_CONTEXT_ANSWER = "No relevant context found in the knowledge base."
 
-        # Non-deprecated retrieval
-        results: List = retriever.invoke(query)  # returns List[Document]
-        print(f"🔍 Retrieved {len(results)} chunks (pre-filter)")
-
-        # --- 3️⃣ Guard against bad docs (None/empty page_content) ---
-        good_docs = []
-        bad_count = 0
-        for d in results:
-            try:
-                if hasattr(d, "page_content") and isinstance(d.page_content, str) and d.page_content.strip():
-                    good_docs.append(d)
-                else:
-                    bad_count += 1
-            except Exception:
+
+def _usable_docs(results: List) -> List:
+    good_docs = []
+    bad_count = 0
+    for d in results:
+        try:
+            if hasattr(d, "page_content") and isinstance(d.page_content, str) and d.page_content.strip():
+                good_docs.append(d)
+            else:
                 bad_count += 1
-        if bad_count:
-            print(f"⚠️ Skipped {bad_count} chunks with missing/invalid page_content")
-
-        if not good_docs:
-            return {
-                "result": {
-                    "response": {
-                        "query": query,
-                        "result": "No relevant context found in the knowledge base.",
-                        "source": "none"
-                    }
-                }
-            }
-
-        # --- 4️⃣ Prompt + chain ---
-        template = (
-            "You are an AI assistant that answers questions based on the provided business documents.\n\n"
-            "Context:\n{context}\n\n"
-            "Question: {input}\n\n"
-            "If the answer is not explicitly stated, respond with a helpful summary of the relevant information from the context."
-        )
+        except Exception:
+            bad_count += 1
+    if bad_count:
+        print(f"⚠️ Skipped {bad_count} chunks with missing/invalid page_content")
+    return good_docs
+
+
+def _packed_context(docs: List) -> List:
+    packed, stats = pack_context(docs)
+    saved = stats["tokens_in"] - stats["tokens_out"]
+    print(
+        f"📦 Context: {stats['chunks']} chunks -> {stats['passages']} passages "
+        f"({stats['duplicates']} duplicates), {stats['tokens_in']} -> {stats['tokens_out']} tokens (saved {saved})"
+    )
+    return packed
 
-        prompt = PromptTemplate(
-            input_variables=["context", "input"],
-            template=template
-        )
-       
-        llm = ChatOpenAI(
-            model_name="gpt-3.5-turbo",
-            temperature=0,
-            openai_api_key=openaikey
-        )
 
-        document_chain = create_stuff_documents_chain(
-            llm=llm,
-            prompt=prompt,
-            document_variable_name="context",
-        )
+# The answer steps below are shared by the sync and async paths; only the
+# I/O between them (loading rows, embedding, searching) differs.
+def _manual_qa_answer(qa) -> Optional[tuple]:
+    if not qa:
+        return None
+    print(f"✅ Answered from Manual QA: {qa[1]}")
+    metrics.count_answer("manual_qa")
+    return qa[2], "manual_qa", None
 
-        retrieval_chain = create_retrieval_chain(retriever, document_chain)
-        response = retrieval_chain.invoke({"input": query, "context": good_docs})
-        final_result = response.get("answer") or response.get("output") or str(response)
 
-        print(f"🧠 Final Answer: {final_result}")
+def _semantic_qa_answer(index, query_vector) -> Optional[tuple]:
+    hit = index.match(query_vector, settings.QA_SEMANTIC_THRESHOLD)
+    if not hit:
+        return None
+    print(f"✅ Answered from Manual QA (similarity {hit[3]:.3f}): {hit[1]}")
+    metrics.count_answer("manual_qa_semantic")
+    return hit[2], "manual_qa", None
+
+
+def _cached_answer(business_id: str, query: str, query_vector, stamp: tuple, timer: StageTimer) -> Optional[tuple]:
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    with timer.stage("answer_cache"):
+        cached = answer_cache.lookup(business_id, query, query_vector, stamp)
+    if not cached:
+        return None
+    print(f"✅ Answered from cache (similarity {cached[1]:.3f})")
+    metrics.count_answer("answer_cache")
+    return cached[0], "documents", None
+
+
+def _documents_answer(results: List, pipeline, query_vector, stamp: tuple, timer: StageTimer) -> tuple:
+    print(f"🔍 Retrieved {len(results)} chunks (pre-filter)")
+
+    # --- 3️⃣ Guard against bad docs (None/empty page_content) ---
+    good_docs = _usable_docs(results)
+    if not good_docs:
+        metrics.count_answer("none")
+        return NO_CONTEXT_ANSWER, "none", None
+
+    # --- 3️⃣b Stitch neighbouring chunks, drop repeats, fit the token budget ---
+    with timer.stage("pack"):
+        good_docs = _packed_context(good_docs)
+
+    return None, "documents", (pipeline, good_docs, query_vector, stamp)
+
+
+def _prepare_answer(business_id: str, query: str, timer: StageTimer):
+    """
+    Everything before generation.
+    Returns (answer, source, None) when no LLM call is needed, otherwise
+    (None, "documents", (pipeline, docs, query_vector, stamp)).
+    """
+    # One read of the shared version stamps serves every cache below
+    stamp = knowledge_stamp(business_id)
+
+    # --- 1️⃣ Manual Q/A first (case-insensitive contains, either direction) ---
+    with timer.stage("qa_match"):
+        qa = qa_indexes.get(business_id, lambda: _load_manual_qa_rows(business_id), stamp[0]).match(query)
+    answered = _manual_qa_answer(qa)
+    if answered:
+        return answered
+
+    # The query is embedded once and reused by every stage below
+    with timer.stage("embed"):
+        query_vector = embeddings.embed_query(query)
+
+    # --- 1️⃣b Paraphrased Manual Q/A (question embeddings vs query embedding) ---
+    if settings.QA_SEMANTIC_ENABLED:
+        with timer.stage("qa_semantic"):
+            index = semantic_qa.get(business_id, lambda: _load_manual_qa_rows(business_id), embeddings, stamp[0])
+            answered = _semantic_qa_answer(index, query_vector)
+        if answered:
+            return answered
+
+    # --- 1️⃣c Answer generated earlier for a near-identical query ---
+    answered = _cached_answer(business_id, query, query_vector, stamp, timer)
+    if answered:
+        return answered
+
+    # --- 2️⃣ Single vector search through the cached per-business pipeline ---
+    with timer.stage("pipeline"):
+        pipeline = pipelines.get(business_id, stamp[1])
+    with timer.stage("search"):
+        results: List = pipeline.search(query_vector, query=query)
+    return _documents_answer(results, pipeline, query_vector, stamp, timer)
+
+
+def _remember_answer(business_id: str, query: str, generation: tuple, answer: str, current_stamp: tuple = None):
+    _, docs, query_vector, stamp = generation
+    print(f"🧠 Final Answer: {answer}")
+    if settings.ANSWER_CACHE_ENABLED:
+        answer_cache.store(business_id, query, query_vector, answer, stamp, current_stamp)
+    if metrics.ENABLED:
+        prompt_tokens = count_tokens(query) + sum(count_tokens(d.page_content) for d in docs)
+        metrics.count_answer("documents", prompt_tokens, count_tokens(answer))
 
-        return {
-            "result": {
-                "response": {
-                    "query": query,
-                    "result": final_result,
-                    "source": "documents"
-                }
-            }
-        }
+
+def _flight_key(business_id: str, query: str, stamp: tuple) -> tuple:
+    return str(business_id), normalize_query(query), stamp
+
+
+def _echo_query(response: dict, query: str) -> dict:
+    # A coalesced caller gets the shared answer under its own spelling of the query
+    inner = response["result"]["response"]
+    return response if inner["query"] == query else _query_response(query, inner["result"], inner["source"])
+
+
+def answer_query(business_id: str, query: str):
+    """
+    Answer a query on the calling thread (scripts, benchmarks); the API uses
+    aanswer_query. Identical concurrent queries share one computation.
+    """
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return _answer_query(business_id, query)
+    key = _flight_key(business_id, query, knowledge_stamp(business_id))
+    return _echo_query(query_flights.do(key, partial(_answer_query, business_id, query)), query)
+
+
+def _answer_query(business_id: str, query: str):
+    timer = StageTimer()
+    failed = False
+    try:
+        print(f"🔍 Query received for business={business_id}: '{query}'")
+        answer, source, generation = _prepare_answer(business_id, query, timer)
+
+        # --- 4️⃣ Filtered docs go straight into the stuff-documents chain ---
+        if generation:
+            pipeline, docs = generation[:2]
+            with timer.stage("generate"):
+                answer = pipeline.generate(query, docs)
+            _remember_answer(business_id, query, generation, answer)
+
+        return _query_response(query, answer, source)
 
     except Exception as e:
+        failed = True
         print(f"❌ answer_query error: {e}")
-        return {
-            "result": {
-                "response": {
-                    "query": query,
-                    "result": f"Error: {str(e)}",
-                    "source": "error"
-                }
-            }
+        return _query_response(query, f"Error: {str(e)}", "error")
+    finally:
+        metrics.observe_timer("query", business_id, timer, error=failed)
+
+
+# ----------------------------------------------------
+# 4b. Query Chatbot (async)
+# ----------------------------------------------------
+# Same steps as above on async clients, so a query waiting on OpenAI or
+# Qdrant does not hold a threadpool thread. Blocking first-load work
+# (building the Q/A index or paraphrase matrix, opening index files,
+# embedding cache reads/writes) is pushed to a thread.
+
+async def _aload_manual_qa_rows(business_id: str):
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(ManualQA.id, ManualQA.question, ManualQA.answer)
+            .where(ManualQA.business_id == business_id)
+            .order_by(ManualQA.created_at)
+        )
+        return result.all()
+
+
+async def _aprepare_answer(business_id: str, query: str, timer: StageTimer):
+    """Async counterpart of _prepare_answer, with the same return values."""
+    stamp = await versions.aget_stamp(business_id)
+    rows = None
+    with timer.stage("qa_match"):
+        qa_index = qa_indexes.peek(business_id, stamp[0])
+        if qa_index is None:
+            rows = await _aload_manual_qa_rows(business_id)
+            qa_index = await asyncio.to_thread(qa_indexes.put, business_id, rows, stamp[0])
+        qa = qa_index.match(query)
+    answered = _manual_qa_answer(qa)
+    if answered:
+        return answered
+
+    with timer.stage("embed"):
+        query_vector = await embeddings.aembed_query(query)
+
+    if settings.QA_SEMANTIC_ENABLED:
+        with timer.stage("qa_semantic"):
+            index = semantic_qa.peek(business_id, stamp[0])
+            if index is None:
+                if rows is None:
+                    rows = await _aload_manual_qa_rows(business_id)
+                index = await asyncio.to_thread(semantic_qa.put, business_id, rows, stamp[0], embeddings)
+            answered = _semantic_qa_answer(index, query_vector)
+        if answered:
+            return answered
+
+    answered = _cached_answer(business_id, query, query_vector, stamp, timer)
+    if answered:
+        return answered
+
+    with timer.stage("pipeline"):
+        pipeline = await pipelines.aget(business_id, stamp[1])
+    with timer.stage("search"):
+        results: List = await pipeline.asearch(query_vector, query=query)
+    return _documents_answer(results, pipeline, query_vector, stamp, timer)
+
+
+async def aanswer_query(business_id: str, query: str):
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return await _aanswer_query(business_id, query)
+    key = _flight_key(business_id, query, await versions.aget_stamp(business_id))
+    response = await query_flights.ado(key, partial(_aanswer_query, business_id, query))
+    return _echo_query(response, query)
+
+
+async def _aanswer_query(business_id: str, query: str):
+    timer = StageTimer()
+    failed = False
+    try:
+        print(f"🔍 Query received for business={business_id}: '{query}'")
+        answer, source, generation = await _aprepare_answer(business_id, query, timer)
+        if generation:
+            pipeline, docs = generation[:2]
+            with timer.stage("generate"):
+                answer = await pipeline.agenerate(query, docs)
+            _remember_answer(business_id, query, generation, answer, await versions.aget_stamp(business_id))
+
+        return _query_response(query, answer, source)
+
+    except Exception as e:
+        failed = True
+        print(f"❌ aanswer_query error: {e}")
+        return _query_response(query, f"Error: {str(e)}", "error")
+    finally:
+        metrics.observe_timer("query", business_id, timer, error=failed)
+
+
+async def astream_answer(business_id: str, query: str) -> AsyncIterator[tuple]:
+    """
+    Streaming variant of aanswer_query. Yields ("token", text) as the model
+    produces it, then ("done", {query, result, source, ttft_ms}), or
+    ("error", {query, result, source}) if answering fails. Answers that need
+    no generation (manual Q/A, cache, no context) arrive as a single token.
+    """
+    timer = StageTimer()
+    ttft_ms = None
+    failed = False
+    try:
+        print(f"🔍 Streaming query for business={business_id}: '{query}'")
+        answer, source, generation = await _aprepare_answer(business_id, query, timer)
+
+        if generation is None:
+            ttft_ms = timer.elapsed_ms()
+            yield "token", answer
+        else:
+            pipeline, docs = generation[:2]
+            parts = []
+            with timer.stage("generate"):
+                async for token in pipeline.astream(query, docs):
+                    if not token:
+                        continue
+                    if ttft_ms is None:
+                        ttft_ms = timer.elapsed_ms()
+                    parts.append(token)
+                    yield "token", token
+            answer = "".join(parts)
+            _remember_answer(business_id, query, generation, answer, await versions.aget_stamp(business_id))
+
+        yield "done", {
+            "query": query,
+            "result": answer,
+            "source": source,
+            "ttft_ms": round(ttft_ms, 1) if ttft_ms is not None else None,
         }
-    
+
+    except Exception as e:
+        failed = True
+        print(f"❌ astream_answer error: {e}")
+        yield "error", {"query": query, "result": f"Error: {str(e)}", "source": "error"}
+    finally:
+        metrics.observe_timer("stream", business_id, timer, error=failed, ttft_ms=ttft_ms)
+
+
+# ----------------------------------------------------
+# 5. Stats
+# ----------------------------------------------------
+def get_stats(db: Session):
+    cache_stats = embeddings.stats() if isinstance(embeddings, CachedEmbeddings) else None
+
+    # Stored files vs distinct contents: how much duplicate text the table holds
+    files, distinct_files = (
+        db.query(func.count(Knowledge.id), func.count(distinct(Knowledge.content_hash)))
+        .filter(Knowledge.content_hash.isnot(None))
+        .one()
+    )
+    with _upload_counts_lock:
+        counts = dict(_upload_counts)
+    uploads = counts["uploads"]
+    return {
+        "embedding_cache": cache_stats,
+        "answer_cache": answer_cache.stats() if settings.ANSWER_CACHE_ENABLED else None,
+        "single_flight": query_flights.stats() if settings.SINGLE_FLIGHT_ENABLED else None,
+        "uploads": {
+            **counts,
+            "dedup_ratio": round((counts["duplicates"] + counts["text_reused"]) / uploads, 4)
+            if uploads else 0.0,
+            "stored_files": files,
+            "distinct_files": distinct_files,
+            "stored_dedup_ratio": round(1 - distinct_files / files, 4) if files else 0.0,
+        },
+    }
+
+
+def _cache_metrics():
+    """Cache and coalescing counters for /metrics, read from their stats() at scrape time."""
+    lookups = []
+    if isinstance(embeddings, CachedEmbeddings):
+        st = embeddings.stats()
+        lookups += [
+            ({"cache": "embedding", "result": "hit"}, st["memory_hits"] + st["disk_hits"]),
+            ({"cache": "embedding", "result": "miss"}, st["misses"]),
+        ]
+    if settings.ANSWER_CACHE_ENABLED:
+        st = answer_cache.stats()
+        lookups += [
+            ({"cache": "answer", "result": "hit"}, st["hits"]),
+            ({"cache": "answer", "result": "miss"}, st["misses"]),
+        ]
+    yield "chatflow_cache_lookups_total", "Cache lookups by cache and result.", "counter", lookups
+    if settings.SINGLE_FLIGHT_ENABLED:
+        st = query_flights.stats()
+        yield "chatflow_coalesced_queries_total", "Queries that shared an in-flight computation.", "counter", [
+            ({}, st["coalesced"])
+        ]
+
+
+metrics.register_collector(_cache_metrics)
 
 
 # ----------------------------------------------------
@@ -339,20 +827,26 @@ def delete_knowledge(db: Session, knowledge_id: str):
     if not record:
         return {"message": "❌ Knowledge file not found."}
 
-    db.delete(record)
-    db.commit()
-
+    # Vectors go first: a query that sees the new stamp must not retrieve
+    # (and cache an answer from) the chunks being deleted
     try:
         qdrant.delete(
             collection_name="chatflow_vectors",
             points_selector=qmodels.FilterSelector(
-                filter=qmodels.Filter(
-                    must=[qmodels.FieldCondition(key="business_id", match=qmodels.MatchValue(value=str(record.business_id)))]
-                )
+                filter=_source_filter(record.business_id, "knowledge_id", record.id)
             ),
         )
     except Exception as e:
         print(f"⚠️ Failed to delete vectors from Qdrant: {e}")
+    local_indexes.remove_matching(record.business_id, "knowledge_id", record.id)
+
+    db.delete(record)
+    versions.bump_version(db, record.business_id, versions.VECTORS)
+    db.commit()
+
+    # Blobs are shared by identical uploads; drop it with its last row
+    if record.file_url and not db.query(Knowledge.id).filter(Knowledge.file_url == record.file_url).first():
+        blob_store.delete(record.file_url)
 
     return {"message": f"🗑️ Deleted knowledge file '{record.file_name}' successfully."}
 
@@ -362,19 +856,22 @@ def delete_manual_qa(db: Session, qa_id: str):
     if not record:
         return {"message": "❌ Q/A entry not found."}
 
-    db.delete(record)
-    db.commit()
-
+    # Vectors go before the version bump, as in delete_knowledge
     try:
         qdrant.delete(
             collection_name="chatflow_vectors",
             points_selector=qmodels.FilterSelector(
-                filter=qmodels.Filter(
-                    must=[qmodels.FieldCondition(key="business_id", match=qmodels.MatchValue(value=str(record.business_id)))]
-                )
+                filter=_source_filter(record.business_id, "qa_id", record.id)
             ),
         )
     except Exception as e:
         print(f"⚠️ Failed to delete Qdrant vectors: {e}")
+    local_indexes.remove_matching(record.business_id, "qa_id", record.id)
+
+    db.delete(record)
+    version = versions.bump_version(db, record.business_id, versions.QA)
+    versions.bump_version(db, record.business_id, versions.VECTORS)
+    db.commit()
+    semantic_qa.on_removed(record.business_id, record.id, version)
 
     return {"message": "🗑️ Deleted Q/A pair successfully."}
@@ -0,0 +1,73 @@
+# knowledge/upsert.py
+# ----------------------------------------------------
+# Streaming, pipelined Qdrant upserts
+# ----------------------------------------------------
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Optional
+
+from qdrant_client.http import models as qmodels
+
+from core.config import settings
+
+
+def _batched(points: Iterable[qmodels.PointStruct], size: int):
+    it = iter(points)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def upsert_stream(
+    client,
+    collection_name: str,
+    points: Iterable[qmodels.PointStruct],
+    batch_size: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+    wait: Optional[bool] = None,
+    on_progress: Optional[Callable[[int], None]] = None,
+) -> int:
+    """
+    Upsert points from an iterator in fixed-size batches with at most
+    `max_in_flight` requests outstanding. The iterator is only advanced when
+    a slot frees up, which back-pressures whatever produces the points.
+
+    With wait=False Qdrant acknowledges batches before applying them; the
+    last batch is then re-sent with wait=True as a consistency barrier,
+    since a shard applies updates in order. Returns the number of points.
+    """
+    batch_size = batch_size or settings.QDRANT_UPSERT_BATCH_SIZE
+    max_in_flight = max_in_flight or settings.QDRANT_UPSERT_IN_FLIGHT
+    wait = settings.QDRANT_UPSERT_WAIT if wait is None else wait
+
+    def send(batch, wait_flag):
+        client.upsert(collection_name=collection_name, points=batch, wait=wait_flag)
+        return len(batch)
+
+    done = 0
+    last_batch = None
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        try:
+            for batch in _batched(points, batch_size):
+                while len(in_flight) >= max_in_flight:
+                    done += in_flight.popleft().result()
+                    if on_progress:
+                        on_progress(done)
+                in_flight.append(pool.submit(send, batch, wait))
+                last_batch = batch
+            while in_flight:
+                done += in_flight.popleft().result()
+                if on_progress:
+                    on_progress(done)
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    if last_batch is not None and not wait:
+        send(last_batch, True)
+    return done
@@ -0,0 +1,114 @@
+# knowledge/versions.py
+# ----------------------------------------------------
+# Per-business knowledge version stamps
+# ----------------------------------------------------
+#
+# In-process caches (Q/A index, paraphrase matrix, retrieval pipeline, answer
+# cache, single-flight keys) key their contents on these stamps. The stamps
+# live in the `knowledge_versions` table, so every API worker and training
+# worker process sees the same values: anything that changes a tenant's
+# knowledge bumps the matching kind in the same transaction as the change,
+# which invalidates every cache built against the old value, in every
+# process. Reads are served from a per-process copy that is at most
+# KNOWLEDGE_VERSION_REFRESH_SECONDS old (a local bump drops it on commit).
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.db import SessionLocal, AsyncSessionLocal
+from knowledge.models import KnowledgeVersion
+
+QA = "qa"            # ManualQA rows added / deleted
+VECTORS = "vectors"  # chatflow_vectors contents changed by training / deletes
+
+_COLUMNS = {QA: KnowledgeVersion.qa_version, VECTORS: KnowledgeVersion.vectors_version}
+_KINDS = (QA, VECTORS)
+_MAX_CACHED_BUSINESSES = 100000
+
+_stamps: "OrderedDict[str, Tuple[Tuple[int, int], float]]" = OrderedDict()  # business -> (stamp, read at)
+_lock = threading.Lock()
+
+
+def _stamp_query(business_id):
+    return select(KnowledgeVersion.qa_version, KnowledgeVersion.vectors_version).where(
+        KnowledgeVersion.business_id == business_id
+    )
+
+
+def _cached(key: str):
+    with _lock:
+        entry = _stamps.get(key)
+    if entry is not None and time.monotonic() - entry[1] < settings.KNOWLEDGE_VERSION_REFRESH_SECONDS:
+        return entry[0]
+    return None
+
+
+def _remember(key: str, row) -> Tuple[int, int]:
+    stamp = (row[0], row[1]) if row is not None else (0, 0)
+    with _lock:
+        _stamps[key] = (stamp, time.monotonic())
+        _stamps.move_to_end(key)
+        while len(_stamps) > _MAX_CACHED_BUSINESSES:
+            _stamps.popitem(last=False)
+    return stamp
+
+
+def _forget(key: str):
+    with _lock:
+        _stamps.pop(key, None)
+
+
+def get_stamp(business_id) -> Tuple[int, int]:
+    """(Q/A version, vectors version) of a business."""
+    key = str(business_id)
+    stamp = _cached(key)
+    if stamp is not None:
+        return stamp
+    db = SessionLocal()
+    try:
+        return _remember(key, db.execute(_stamp_query(business_id)).first())
+    finally:
+        db.close()
+
+
+async def aget_stamp(business_id) -> Tuple[int, int]:
+    """get_stamp for the async query path."""
+    key = str(business_id)
+    stamp = _cached(key)
+    if stamp is not None:
+        return stamp
+    async with AsyncSessionLocal() as db:
+        return _remember(key, (await db.execute(_stamp_query(business_id))).first())
+
+
+def get_version(business_id, kind: str) -> int:
+    return get_stamp(business_id)[_KINDS.index(kind)]
+
+
+def bump_version(db: Session, business_id, kind: str) -> int:
+    """
+    Increment one version of a business inside `db`'s transaction and return
+    the new value; it becomes visible to other processes when the caller commits.
+    """
+    column = _COLUMNS[kind]
+    row = db.query(KnowledgeVersion).filter(KnowledgeVersion.business_id == business_id)
+    values = {column: column + 1, KnowledgeVersion.updated_at: datetime.utcnow()}
+    if not row.update(values, synchronize_session=False):
+        try:
+            with db.begin_nested():
+                db.add(KnowledgeVersion(business_id=business_id, **{column.key: 1}))
+        except IntegrityError:
+            # Another transaction created the row first
+            row.update(values, synchronize_session=False)
+    # This process's copy is dropped once the new value is committed
+    key = str(business_id)
+    event.listen(db, "after_commit", lambda session: _forget(key), once=True)
+    return db.query(column).filter(KnowledgeVersion.business_id == business_id).scalar()
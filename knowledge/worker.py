@@ -0,0 +1,34 @@
+# knowledge/worker.py
+# ----------------------------------------------------
+# Standalone training worker process
+#
+#   TRAIN_WORKER_MODE=external uvicorn main:app ...
+#   python -m knowledge.worker --workers 4
+# ----------------------------------------------------
+
+import argparse
+import signal
+import threading
+
+from core.config import settings
+from knowledge import jobs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ChatFlow training jobs outside the API process.")
+    parser.add_argument("--workers", type=int, default=settings.TRAIN_WORKERS)
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+
+    jobs.start_workers(args.workers)
+    print(f"🛠️ Training worker started with {args.workers} threads")
+    stop.wait()
+    jobs.stop_workers()
+    print("👋 Training worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,34 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from core.db import Base, engine
+from core.db import Base, engine, upgrade_schema
 from auth.router import router as auth_router
 from knowledge.router import router as knowledge_router
 from business.router import router as business_router
 from widget.router import router as widget_router
 from integerations.calendly.router import router as calendly_router
+from core.config import settings
+from core import metrics
+from knowledge import jobs
 from dotenv import load_dotenv
 load_dotenv()
 
 
 Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
 
-app = FastAPI(title="ChatFlow Backend")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Training jobs run in this process unless a separate `python -m knowledge.worker` handles them
+    if settings.TRAIN_WORKER_MODE == "inprocess":
+        jobs.start_workers()
+    yield
+    jobs.stop_workers()
+
+
+app = FastAPI(title="ChatFlow Backend", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -31,3 +47,11 @@ app.include_router(calendly_router)
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Prometheus scrape endpoint; 404 unless METRICS_ENABLED."""
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -1,26 +1,21 @@
 from qdrant_client import QdrantClient
-from qdrant_client.http import models as qmodels
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
+from knowledge.collection import COLLECTION_NAME, alias_target, create_collection
+
 client = QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"))
 
-# delete old collection
+# delete old collection (after a layout migration the name is an alias)
 try:
-    client.delete_collection("chatflow_vectors")
+    target = alias_target(client, COLLECTION_NAME)
+    if target:
+        client.delete_collection(target)
+    client.delete_collection(COLLECTION_NAME)
     print("🧹 Old collection deleted.")
 except:
     pass
 
-# recreate properly with keyword index ready
-client.create_collection(
-    collection_name="chatflow_vectors",
-    vectors_config=qmodels.VectorParams(size=1536, distance=qmodels.Distance.COSINE),
-)
-client.create_payload_index(
-    collection_name="chatflow_vectors",
-    field_name="business_id",
-    field_schema="keyword"
-)
-print("✅ Fresh chatflow_vectors collection created and indexed.")
+# recreate with the configured quantization / on-disk / HNSW settings and keyword indexes
+create_collection(client)
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import Response, HTMLResponse
+from fastapi.responses import Response, HTMLResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from core.db import get_db
+from core.db import get_db, get_async_db
 from widget import service
 from widget.models import WidgetChatSession, WidgetChatMessage
 from widget.schemas import (
@@ -38,12 +39,27 @@ def get_settings(business_id: UUID, db: Session = Depends(get_db)):
 # 3️⃣ Widget Query Endpoint (Chat Message)
 # -----------------------------------------------------
 @router.post("/query", response_model=WidgetQueryResponse)
-def chat_with_widget(payload: WidgetQuery, db: Session = Depends(get_db)):
+async def chat_with_widget(payload: WidgetQuery, db: AsyncSession = Depends(get_async_db)):
     """
     Endpoint used by the embedded website widget.
     Sends user message -> returns AI answer based on knowledge & manual QA.
+    Runs on the event loop, so waiting on OpenAI/Qdrant does not hold a thread.
     """
-    return service.handle_widget_query(db, payload.business_id, payload.query)
+    return await service.ahandle_widget_query(db, payload.business_id, payload.query)
+
+
+@router.post("/query/stream")
+async def stream_chat_with_widget(payload: WidgetQuery, db: AsyncSession = Depends(get_async_db)):
+    """
+    Streaming variant of /widget/query (Server-Sent Events): `token` events
+    as the answer is generated, then `done` with the full answer, its source
+    and time-to-first-token.
+    """
+    return StreamingResponse(
+        await service.astream_widget_query(db, payload.business_id, payload.query),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # -----------------------------------------------------
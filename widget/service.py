@@ -1,8 +1,12 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from widget.models import WidgetSettings, WidgetSettings, WidgetChatSession, WidgetChatMessage
 from widget.schemas import WidgetSettingsCreate, WidgetQueryResponse
-from knowledge.service import answer_query  # ✅ Using your existing logic
+from core.db import AsyncSessionLocal
+from core.utils import sse_event
+from knowledge.service import aanswer_query, astream_answer  # ✅ Using your existing logic
 
 # -----------------------------------------------------
 # Save / Update Widget Settings
@@ -33,56 +37,57 @@ def get_widget_settings(db: Session, business_id):
     return settings
 
 # -----------------------------------------------------
-# Handle Widget Query (calls Knowledge logic)
+# Handle Widget Query (async DB session + async query path)
 # -----------------------------------------------------
-def handle_widget_query(db: Session, business_id, query: str) -> WidgetQueryResponse:
+async def _astart_widget_turn(db: AsyncSession, business_id, query: str):
+    # Create or find a chat session, then save the user's message
+    visitor_id = "anonymous"  # later you can make this unique per visitor
+    result = await db.execute(
+        select(WidgetChatSession).filter_by(business_id=business_id, visitor_id=visitor_id)
+    )
+    session = result.scalars().first()
+    if not session:
+        session = WidgetChatSession(business_id=business_id, visitor_id=visitor_id)
+        db.add(session)
+        await db.commit()
+        await db.refresh(session)
+
+    db.add(WidgetChatMessage(session_id=session.id, sender="user", message=query))
+    await db.commit()
+    return session
+
+
+async def ahandle_widget_query(db: AsyncSession, business_id, query: str) -> WidgetQueryResponse:
     try:
-        # Step 1️⃣ - Create or find a chat session
-        visitor_id = "anonymous"  # later you can make this unique per visitor
-        session = (
-            db.query(WidgetChatSession)
-            .filter_by(business_id=business_id, visitor_id=visitor_id)
-            .first()
-        )
-        if not session:
-            session = WidgetChatSession(
-                business_id=business_id,
-                visitor_id=visitor_id
-            )
-            db.add(session)
-            db.commit()
-            db.refresh(session)
-
-        # Step 2️⃣ - Save user's message
-        db.add(WidgetChatMessage(
-            session_id=session.id,
-            sender="user",
-            message=query
-        ))
-        db.commit()
+        session = await _astart_widget_turn(db, business_id, query)
 
-        # Step 3️⃣ - Call LLM as usual
-        result = answer_query(str(business_id), query)
-        if isinstance(result, dict):
-            answer = (
-                result.get("result", {}).get("response", {}).get("result")
-                or result.get("response", {}).get("result")
-                or str(result)
-            )
-        else:
-            answer = str(result)
-
-        # Step 4️⃣ - Save bot's reply
-        db.add(WidgetChatMessage(
-            session_id=session.id,
-            sender="bot",
-            message=answer
-        ))
-        db.commit()
+        result = await aanswer_query(str(business_id), query)
+        answer = result.get("result", {}).get("response", {}).get("result") or str(result)
+
+        db.add(WidgetChatMessage(session_id=session.id, sender="bot", message=answer))
+        await db.commit()
 
-        # Step 5️⃣ - Return response to widget
         return WidgetQueryResponse(answer=answer)
 
     except Exception as e:
         return WidgetQueryResponse(answer=f"Error: {str(e)}")
 
+
+async def astream_widget_query(db: AsyncSession, business_id, query: str):
+    """
+    Saves the visitor's message, then returns an SSE generator: `token` events
+    while the answer is generated and a final `done` event with the source.
+    The bot message is persisted once the stream completes.
+    """
+    session_id = (await _astart_widget_turn(db, business_id, query)).id
+
+    async def events():
+        async for event, data in astream_answer(str(business_id), query):
+            if event in ("done", "error"):
+                # The request's session may already be closed while streaming
+                async with AsyncSessionLocal() as bot_db:
+                    bot_db.add(WidgetChatMessage(session_id=session_id, sender="bot", message=data["result"]))
+                    await bot_db.commit()
+            yield sse_event(event, data)
+
+    return events()